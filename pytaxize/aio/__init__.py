@@ -0,0 +1,92 @@
+"""
+Asyncio interface to pytaxize
+
+Each provider module has an ``async`` twin under `pytaxize.aio` whose
+lookup functions take the same arguments and return exactly the same parsed
+structures as the blocking versions; generators such as
+`itis.search_any_match` or `ncbi.iter_hierarchy` become async generators.
+Calls are dispatched to a bounded thread pool that uses the shared HTTP
+connection pool, so thousands of lookups can be gathered concurrently.
+Configuration functions (e.g. `itis.set_backend`, `itis.memo_clear`) and
+classes (e.g. `itis.TaxonRecord`) have no twins; use them from the
+blocking modules.
+
+Usage::
+
+    import asyncio
+    from pytaxize.aio import itis
+
+    async def main(tsns):
+        return await asyncio.gather(*[itis.hierarchy_full(w) for w in tsns])
+
+    asyncio.run(main([37906, 100800, 180543]))
+
+    async def names():
+        return [w async for w in itis.search_any_match("Zyg", page_size=50)]
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from pytaxize.utils import in_context
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="pytaxize-aio")
+
+
+def set_concurrency(workers=16):
+    """
+    Set the maximum number of requests in flight for `pytaxize.aio` calls
+
+    :param workers: (int) maximum number of concurrent requests
+
+    Usage::
+
+        from pytaxize import aio
+        from pytaxize.refactor import configure_pool
+        aio.set_concurrency(32)
+        configure_pool(maxsize=32)
+    """
+    global _executor
+    old = _executor
+    _executor = ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="pytaxize-aio"
+    )
+    old.shutdown(wait=False)
+
+
+def _asyncify(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _executor, in_context(functools.partial(func, *args, **kwargs))
+        )
+
+    return wrapper
+
+
+_done = object()
+
+
+def _asyncify_iter(func):
+    # each item is taken from the blocking generator on the thread pool
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        items = await loop.run_in_executor(
+            _executor, in_context(functools.partial(func, *args, **kwargs))
+        )
+        step = in_context(next)
+        try:
+            while True:
+                item = await loop.run_in_executor(_executor, step, items, _done)
+                if item is _done:
+                    return
+                yield item
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None:
+                await loop.run_in_executor(_executor, in_context(close))
+
+    return wrapper
@@ -0,0 +1,20 @@
+"""
+Async versions of the `pytaxize.col` functions
+
+Usage::
+
+    import asyncio
+    from pytaxize.aio import col
+    asyncio.run(col.search(name=["Apis"]))
+"""
+
+from pytaxize import col as _sync
+from pytaxize.aio import _asyncify
+
+children = _asyncify(_sync.children)
+search = _asyncify(_sync.search)
+
+__all__ = [
+    "children",
+    "search",
+]
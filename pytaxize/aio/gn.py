@@ -0,0 +1,28 @@
+"""
+Async versions of the `pytaxize.gn` functions
+
+Usage::
+
+    import asyncio
+    from pytaxize.aio import gn
+    asyncio.run(gn.resolve("Helianthus annus"))
+"""
+
+from pytaxize import gn as _sync
+from pytaxize.aio import _asyncify, _asyncify_iter
+
+details = _asyncify(_sync.details)
+parse = _asyncify(_sync.parse)
+search = _asyncify(_sync.search)
+datasources = _asyncify(_sync.datasources)
+resolve = _asyncify(_sync.resolve)
+iter_search = _asyncify_iter(_sync.iter_search)
+
+__all__ = [
+    "details",
+    "parse",
+    "search",
+    "datasources",
+    "resolve",
+    "iter_search",
+]
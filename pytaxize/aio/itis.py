@@ -0,0 +1,72 @@
+"""
+Async versions of the `pytaxize.itis` functions
+
+Usage::
+
+    import asyncio
+    from pytaxize.aio import itis
+    asyncio.run(itis.hierarchy_full(tsn=37906))
+"""
+
+from pytaxize import itis as _sync
+from pytaxize.aio import _asyncify, _asyncify_iter
+
+accepted_names = _asyncify(_sync.accepted_names)
+any_match_count = _asyncify(_sync.any_match_count)
+batch = _asyncify(_sync.batch)
+comment_detail = _asyncify(_sync.comment_detail)
+common_names = _asyncify(_sync.common_names)
+core_metadata = _asyncify(_sync.core_metadata)
+coverage = _asyncify(_sync.coverage)
+credibility_rating = _asyncify(_sync.credibility_rating)
+credibility_ratings = _asyncify(_sync.credibility_ratings)
+currency = _asyncify(_sync.currency)
+date_data = _asyncify(_sync.date_data)
+downstream = _asyncify(_sync.downstream)
+experts = _asyncify(_sync.experts)
+full_record = _asyncify(_sync.full_record)
+geographic_divisions = _asyncify(_sync.geographic_divisions)
+geographic_values = _asyncify(_sync.geographic_values)
+global_species_completeness = _asyncify(_sync.global_species_completeness)
+hierarchy_down = _asyncify(_sync.hierarchy_down)
+hierarchy_full = _asyncify(_sync.hierarchy_full)
+hierarchy_up = _asyncify(_sync.hierarchy_up)
+jurisdiction_origin_values = _asyncify(_sync.jurisdiction_origin_values)
+jurisdiction_values = _asyncify(_sync.jurisdiction_values)
+jurisdictional_origin = _asyncify(_sync.jurisdictional_origin)
+rank_name = _asyncify(_sync.rank_name)
+search_any_match = _asyncify_iter(_sync.search_any_match)
+search_common = _asyncify_iter(_sync.search_common)
+search_scientific = _asyncify_iter(_sync.search_scientific)
+terms = _asyncify(_sync.terms)
+
+__all__ = [
+    "accepted_names",
+    "any_match_count",
+    "batch",
+    "comment_detail",
+    "common_names",
+    "core_metadata",
+    "coverage",
+    "credibility_rating",
+    "credibility_ratings",
+    "currency",
+    "date_data",
+    "downstream",
+    "experts",
+    "full_record",
+    "geographic_divisions",
+    "geographic_values",
+    "global_species_completeness",
+    "hierarchy_down",
+    "hierarchy_full",
+    "hierarchy_up",
+    "jurisdiction_origin_values",
+    "jurisdiction_values",
+    "jurisdictional_origin",
+    "rank_name",
+    "search_any_match",
+    "search_common",
+    "search_scientific",
+    "terms",
+]
@@ -0,0 +1,22 @@
+"""
+Async versions of the `pytaxize.ncbi` functions
+
+Usage::
+
+    import asyncio
+    from pytaxize.aio import ncbi
+    asyncio.run(ncbi.hierarchy(ids=9606))
+"""
+
+from pytaxize import ncbi as _sync
+from pytaxize.aio import _asyncify, _asyncify_iter
+
+hierarchy = _asyncify(_sync.hierarchy)
+search = _asyncify(_sync.search)
+iter_hierarchy = _asyncify_iter(_sync.iter_hierarchy)
+
+__all__ = [
+    "hierarchy",
+    "search",
+    "iter_hierarchy",
+]
@@ -0,0 +1,24 @@
+"""
+Async versions of the `pytaxize.tax` functions
+
+Usage::
+
+    import asyncio
+    from pytaxize.aio import tax
+    asyncio.run(tax.vascan_search(q=["Helianthus annuus"]))
+"""
+
+from pytaxize import tax as _sync
+from pytaxize.aio import _asyncify, _asyncify_iter
+
+names_list = _asyncify(_sync.names_list)
+vascan_search = _asyncify(_sync.vascan_search)
+scrapenames = _asyncify(_sync.scrapenames)
+scrapenames_batch = _asyncify_iter(_sync.scrapenames_batch)
+
+__all__ = [
+    "names_list",
+    "vascan_search",
+    "scrapenames",
+    "scrapenames_batch",
+]
@@ -0,0 +1,182 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def cache_dir():
+    """
+    Directory where pytaxize keeps its persistent caches
+
+    Set by the ``PYTAXIZE_CACHE_DIR`` environment variable, otherwise
+    ``$XDG_CACHE_HOME/pytaxize`` (``~/.cache/pytaxize`` by default)
+    """
+    path = os.environ.get("PYTAXIZE_CACHE_DIR")
+    if path is None:
+        base = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+        path = os.path.join(base, "pytaxize")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+# query parameters that identify the caller rather than the query
+_ignored_params = {"api_key"}
+
+# number of cache hits whose access times are kept before writing them out
+_touch_batch = 1000
+
+
+class ResponseCache:
+    """
+    Persistent HTTP response cache backed by SQLite
+
+    Responses are keyed on method, URL and the normalized payload, expire
+    after a time-to-live that can be set per host, and the least recently
+    used entries are evicted once the cache grows past `max_size`.
+
+    :param path: (str) path to the SQLite file, default
+        ``<cache_dir>/http_cache.sqlite``
+    :param ttl: (int) default time-to-live in seconds
+    :param ttls: (dict) per-host time-to-live in seconds, keyed by host name,
+        e.g. ``{"www.itis.gov": 30 * 86400}``
+    :param max_size: (int) maximum total size of cached bodies in bytes
+    """
+
+    def __init__(self, path=None, ttl=7 * 86400, ttls=None, max_size=512 * 2**20):
+        if path is None:
+            path = os.path.join(cache_dir(), "http_cache.sqlite")
+        self.path = path
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                host TEXT,
+                created REAL,
+                accessed REAL,
+                size INTEGER,
+                encoding TEXT,
+                headers TEXT,
+                content BLOB
+            );
+            CREATE INDEX IF NOT EXISTS ix_responses_accessed
+                ON responses (accessed);
+            """
+        )
+        # a commit per write without an fsync each time; readers and the
+        # writer don't block each other
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        # access times of hits, written in batches rather than one per read
+        self._touched = {}
+        self._size = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    @staticmethod
+    def key(method, url, payload=None, body=None):
+        payload = payload or {}
+        params = sorted(
+            (str(k), str(v)) for k, v in payload.items() if k not in _ignored_params
+        )
+        return json.dumps([method.upper(), url, params, body], sort_keys=True)
+
+    def get(self, key, host):
+        """Return ``(content, encoding, headers)`` or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created, encoding, headers, content FROM responses "
+                "WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None or now - row[0] > self.ttls.get(host, self.ttl):
+                self.misses += 1
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= _touch_batch:
+                self._flush()
+                self._conn.commit()
+            self.hits += 1
+        return row[3], row[1], json.loads(row[2])
+
+    def set(self, key, host, content, encoding=None, headers=None):
+        now = time.time()
+        with self._lock:
+            self._flush()
+            old = self._conn.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    host,
+                    now,
+                    now,
+                    len(content),
+                    encoding,
+                    json.dumps(dict(headers or {})),
+                    content,
+                ),
+            )
+            self._size += len(content) - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def _flush(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE responses SET accessed = ? WHERE key = ?",
+                [(v, k) for k, v in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _evict(self):
+        # drop the least recently used entries a few at a time, so a full
+        # cache does not read the whole table on every insert
+        while self._size > self.max_size:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed LIMIT 16"
+            ).fetchall()
+            if not rows:
+                self._size = 0
+                return
+            drop = []
+            for key, size in rows:
+                if self._size <= self.max_size:
+                    break
+                drop.append((key,))
+                self._size -= size
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", drop)
+
+    def clear(self):
+        with self._lock:
+            self._touched.clear()
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            size = self._size
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": count,
+            "size": size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._conn.commit()
+            self._conn.close()
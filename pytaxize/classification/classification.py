@@ -1,6 +1,7 @@
 import warnings
 
-from pytaxize.itis import hierarchy_full
+from pytaxize.itis import hierarchy_full, hierarchy_up
+from pytaxize.lineage import LineageNode, itis_ancestors, ncbi_ancestors
 from pytaxize.ncbi import hierarchy
 
 
@@ -34,6 +35,15 @@ class Classification:
         x
         x.ids
         x.ncbi()
+
+        # reuse ancestors seen in earlier responses, fetching only
+        # what is not known yet
+        x = Classification([180543, 180544, 180545])
+        x.itis(cache=True)
+        Classification([9606, 9598]).ncbi(cache=True)
+
+        # taxa as shared read-only nodes, for large jobs
+        Classification([9606, 9598]).ncbi(compact=True)
     """
 
     def __init__(self, ids):
@@ -46,20 +56,68 @@ class Classification:
         y = f"ids: {','.join([str(w) for w in self.ids[:10]])}"
         return x + y
 
-    def itis(self):
+    def itis(self, cache=False, compact=False):
+        """
+        Get ITIS hierarchies
+
+        :param cache: (bool) answer from the lineages of taxa seen in earlier
+            ITIS hierarchy responses where possible. A taxon whose parent is
+            known costs one `itis.hierarchy_up` request at most; otherwise
+            the full hierarchy of its parent is fetched, which also makes its
+            siblings known. Results then hold the lineage only (kingdom down
+            to the taxon), without the children `itis.hierarchy_full` adds
+        :param compact: (bool) give each taxon as a read-only
+            `pytaxize.lineage.LineageNode` shared by all lineages containing
+            it, instead of a dict
+        """
         out = []
         for i in range(len(self.ids)):
             id = self.ids[i]
-            res = hierarchy_full(id)
+            if cache:
+                with itis_ancestors.record():
+                    res = self._itis_lineage(id, compact) or hierarchy_full(id)
+            else:
+                res = hierarchy_full(id)
             if res[0] is None:
                 warnings.warn("No results for taxon '" + str(id) + "'")
                 res = {}
+            elif compact:
+                res = [LineageNode.of(w) for w in res]
             out.append(res)
         out = dict(zip(self.ids, out))
         return out
 
-    def ncbi(self):
-        res = hierarchy(self.ids)
+    @staticmethod
+    def _itis_lineage(id, compact=False):
+        res = itis_ancestors.lineage(id, compact)
+        if res is None and id not in itis_ancestors:
+            hierarchy_up(id)
+            res = itis_ancestors.lineage(id, compact)
+        parent = itis_ancestors.parent(id)
+        if res is None and parent is not None:
+            hierarchy_full(parent)
+            res = itis_ancestors.lineage(id, compact)
+        return res
+
+    def ncbi(self, cache=False, compact=False):
+        """
+        Get NCBI hierarchies
+
+        :param cache: (bool) answer from the lineages of taxa seen in earlier
+            NCBI hierarchy responses where possible, fetching only the ids
+            not known yet
+        :param compact: (bool) give each taxon as a read-only
+            `pytaxize.lineage.LineageNode` shared by all lineages containing
+            it, instead of a dict
+        """
+        if cache:
+            res = {id: ncbi_ancestors.lineage(id, compact) for id in self.ids}
+            missing = [id for id, lineage in res.items() if lineage is None]
+            if missing:
+                with ncbi_ancestors.record():
+                    res.update(hierarchy(missing, compact))
+            return res
+        res = hierarchy(self.ids, compact)
         # out = []
         # for i in range(len(self.ids)):
         #     id = self.ids[i]
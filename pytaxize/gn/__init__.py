@@ -1,4 +1,4 @@
-from .gni import details, parse, search
+from .gni import details, iter_search, parse, search
 from .gnr import datasources, resolve
 
-__all__ = ["details", "parse", "search", "datasources", "resolve"]
+__all__ = ["details", "iter_search", "parse", "search", "datasources", "resolve"]
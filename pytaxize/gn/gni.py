@@ -1,21 +1,34 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from pytaxize.gn import parser
 from pytaxize.refactor import Refactor
+from pytaxize.utils import in_context
 
 
 class NoResultError(Exception):
     pass
 
 
-def parse(names):
+def parse(names, engine="remote"):
     """
     Uses the Global Names Index to parse scientific names
 
     :param names: List of scientific names.
+    :param engine: One of remote (the Global Names parser web service) or
+        local (`pytaxize.gn.parser`, parsing without network access; see
+        there for the names it handles)
 
     Usage::
 
         from pytaxize import gn
         gn.gni.parse(names = ['Cyanistes caeruleus','Helianthus annuus'])
+        gn.gni.parse(names = ['Parus major Linnaeus, 1758'], engine = 'local')
     """
+    if engine == "local":
+        return parser.parse(names)
+    if engine != "remote":
+        raise ValueError("'engine' must be either remote or local")
     url = "http://gni.globalnames.org/parsers.json"
     names = "|".join(names)
     params = {"names": names}
@@ -42,6 +55,55 @@ def search(search_term="ani*", per_page=30, page=1):
     return out
 
 
+def iter_search(search_term="ani*", per_page=30, prefetch=4):
+    """
+    Search for names against the Global names index, walking all pages
+
+    The first page gives the total number of matches; the following pages
+    are fetched `prefetch` at a time in the background while earlier ones
+    are read. Closing the generator early (or breaking out of a loop over
+    it) cancels the pages not yet requested and waits for those in flight.
+
+    :param search_term: Search term
+    :param per_page: Items to return per page
+    :param prefetch: (int) number of pages fetched ahead concurrently
+
+    :return: generator of dicts, the ``name_strings`` of all pages
+
+    Usage::
+
+        from pytaxize import gn
+        for x in gn.gni.iter_search(search_term = 'ani*', per_page = 100):
+            print(x["name"])
+        # the first 10 matches only
+        from itertools import islice
+        list(islice(gn.gni.iter_search(search_term = 'ani*'), 10))
+    """
+    first = search(search_term, per_page=per_page, page=1)
+    names = first.get("name_strings") or []
+    yield from names
+    total = int(first.get("name_strings_total") or 0)
+    pages = -(-total // per_page)
+    if not names or pages < 2:
+        return
+
+    fetch = in_context(search)
+    pool = ThreadPoolExecutor(max(1, prefetch))
+    try:
+        queue = deque()
+        page = 2
+        while queue or page <= pages:
+            while page <= pages and len(queue) < max(1, prefetch):
+                queue.append(pool.submit(fetch, search_term, per_page, page))
+                page += 1
+            names = queue.popleft().result().get("name_strings") or []
+            if not names:
+                return
+            yield from names
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
 def details(id=17802847, all_records=1):
     """
     Usage::
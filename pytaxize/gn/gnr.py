@@ -1,14 +1,21 @@
-import os
+import io
 import sys
 import time
+import warnings
 
 from pytaxize.refactor import Refactor
+from pytaxize.utils import dedupe_names, fan_out, run_concurrent
 
 
 class NoResultError(Exception):
     pass
 
 
+# seconds between polls of a POST job, growing by half each poll
+_poll_start = 0.5
+_poll_max = 10
+
+
 def datasources():
     """
     Get data sources for the Global Names Resolver.
@@ -37,6 +44,7 @@ def resolve(
     header_only="false",
     preferred_data_sources="false",
     http="get",
+    workers=4,
 ):
     """
     Uses the Global Names Resolver to resolve scientific names
@@ -50,6 +58,10 @@ def resolve(
     :param header_only: Return header only, logical
     :param preferred_data_sources: Return only preferred data sources.
     :param http: The HTTP method to use, one of "get" or "post". Default="get"
+    :param workers: (int) maximum number of 1000 name chunks resolved at the
+        same time. Names repeated in `names` (ignoring case and whitespace)
+        are resolved once. If a chunk fails, a warning is given and its names get
+        empty results; if all chunks fail, the first error is raised
 
     Usage::
 
@@ -70,24 +82,38 @@ def resolve(
             http,
         )
 
+    # resolve each distinct name once
+    names, index = dedupe_names(names)
     maxlen = 1000
     # splitting list to smaller lists of size <= 1000
     names_sublists = [names[x : x + maxlen] for x in range(0, len(names), maxlen)]
+
+    def func(sublist):
+        return _gnr_resolve(
+            sublist,
+            source,
+            format,
+            resolve_once,
+            with_context,
+            best_match_only,
+            header_only,
+            preferred_data_sources,
+            http,
+        )
+
+    out = run_concurrent(func, names_sublists, workers)
+    errors = [err for _, err in out if err is not None]
+    if errors and len(errors) == len(out):
+        raise errors[0]
     data = []
-    for sublist in names_sublists:
-        data.extend(
-            _gnr_resolve(
-                sublist,
-                source,
-                format,
-                resolve_once,
-                with_context,
-                best_match_only,
-                header_only,
-                preferred_data_sources,
-                http,
+    for sublist, (res, err) in zip(names_sublists, out):
+        if err is not None:
+            warnings.warn(
+                f"Resolving {len(sublist)} names from '{sublist[0]}' failed: {err}"
             )
-        )
+            res = [[] for _ in sublist]
+        data.extend(res)
+    data = fan_out(data, index)
     if data == [[]]:
         sys.exit("No matching results to the query")
 
@@ -129,19 +155,18 @@ def _gnr_resolve(
         if names.__class__.__name__ != "list":
             result_json = Refactor(url, payload, request="post").json()
         else:
-            with open("names_list.txt", "w") as f:
-                for name in names:
-                    f.write(name + "\n")
-            f.close()
+            body = io.BytesIO("".join(w + "\n" for w in names).encode("utf-8"))
             result_json = Refactor(url, payload, request="post").json(
-                files={"file": open("names_list.txt", "rb")}
+                files={"file": ("names_list.txt", body)}
             )
+            delay = _poll_start
             while result_json["status"] == "working":
                 result_url = result_json["url"]
-                time.sleep(10)
-                result_json = Refactor(result_url, payload={}, request="get").json()
-
-            os.remove("names_list.txt")
+                time.sleep(delay)
+                delay = min(delay * 1.5, _poll_max)
+                result_json = Refactor(
+                    result_url, payload={}, request="get", cache=False
+                ).json()
 
     data = []
     for each_result in result_json["data"]:
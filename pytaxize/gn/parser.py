@@ -0,0 +1,307 @@
+import re
+from functools import lru_cache
+
+from pytaxize import __version__
+
+parser_version = "pytaxize-" + __version__
+
+_token = re.compile(r"[()\[\],&]|[^\s()\[\],&]+")
+_genus = re.compile(r"[A-Z][^\W\d_A-Z]+(?:-[^\W\d_A-Z]+)?\Z")
+_epithet = re.compile(r"[^\W\d_A-Z][^\W\d_A-Z'-]+\Z")
+_year = re.compile(r"1[5-9]\d\d\??[a-z]?\Z|20\d\d\??[a-z]?\Z")
+_author = re.compile(r"(?:[A-Z]|d'|O')[^\s()\[\],&]*\Z")
+
+_ranks = {
+    "subsp.": "subsp.",
+    "ssp.": "ssp.",
+    "subsp": "subsp.",
+    "ssp": "ssp.",
+    "var.": "var.",
+    "var": "var.",
+    "subvar.": "subvar.",
+    "f.": "f.",
+    "fo.": "fo.",
+    "forma": "forma",
+    "subf.": "subf.",
+    "morph.": "morph.",
+    "nothosubsp.": "nothosubsp.",
+    "nothovar.": "nothovar.",
+}
+_particles = {"d'", "da", "de", "del", "della", "der", "des", "di", "du", "la"}
+_particles |= {"le", "ten", "ter", "van", "von", "zu"}
+_joiners = {"&", "et", "ex", "in", ","}
+_hybrid = "×"
+
+
+class _Tokens:
+    def __init__(self, name):
+        self.items = [(m.group(), m.start(), m.end()) for m in _token.finditer(name)]
+        self.i = 0
+        self.positions = {}
+
+    def peek(self, offset=0):
+        i = self.i + offset
+        return self.items[i][0] if i < len(self.items) else None
+
+    def take(self, kind=None):
+        text, start, end = self.items[self.i]
+        self.i += 1
+        if kind is not None:
+            self.positions[str(start)] = [kind, end]
+        return text
+
+
+def _join(words):
+    out = " ".join(words)
+    for a, b in ((" ,", ","), ("( ", "("), (" )", ")"), ("[ ", "["), (" ]", "]")):
+        out = out.replace(a, b)
+    return out
+
+
+def _is_author(tokens):
+    word = tokens.peek()
+    if word is None or word in _joiners:
+        return False
+    if word in _particles:
+        return _is_author_word(tokens.peek(1))
+    return _is_author_word(word)
+
+
+def _is_author_word(word):
+    return word is not None and _author.match(word) is not None
+
+
+def _team(tokens):
+    # authors separated by ",", "&", "et", ...; a year may follow a comma
+    authors = []
+    words = []
+    while _is_author(tokens):
+        author = []
+        while _is_author(tokens) or (
+            # "L. f." (filius) is part of the author, "f. alba" is a rank
+            tokens.peek() == "f." and author and not _is_epithet(tokens.peek(1))
+        ):
+            author.append(tokens.take("author_word"))
+        authors.append(" ".join(author))
+        words += author
+        joiner = tokens.peek()
+        if joiner not in _joiners or not _is_author(_Ahead(tokens, 1)):
+            break
+        words.append(tokens.take())
+    if not authors:
+        return None, []
+    team = {"authorTeam": _join(words), "author": authors}
+    if tokens.peek() == "," and _is_year(tokens.peek(1)):
+        words.append(tokens.take())
+    if _is_year(tokens.peek()):
+        team["year"] = tokens.take("year")
+        words.append(team["year"])
+    return team, words
+
+
+def _is_year(word):
+    return word is not None and _year.match(word) is not None
+
+
+def _is_epithet(word):
+    return (
+        word is not None
+        and word not in _particles
+        and word not in ("et", "ex", "in")
+        and _epithet.match(word) is not None
+    )
+
+
+def _authorship(tokens):
+    # ["(" team ")"] [team]
+    out = {}
+    words = []
+    if tokens.peek() == "(" and (
+        _is_author(_Ahead(tokens, 1)) or _is_year(tokens.peek(1))
+    ):
+        start = tokens.i
+        tokens.take()
+        team, inner = _team(tokens)
+        if team is None and _is_year(tokens.peek()):
+            team = {"year": tokens.take("year")}
+            inner = [team["year"]]
+        if team is None or tokens.peek() != ")":
+            tokens.i = start
+            return None
+        tokens.take()
+        out["basionymAuthorTeam"] = team
+        words += ["("] + inner + [")"]
+    team, outer = _team(tokens)
+    if team is not None:
+        key = "combinationAuthorTeam" if words else "basionymAuthorTeam"
+        out[key] = team
+        words += outer
+    if not words:
+        return None
+    out["authorship"] = _join(words)
+    return out
+
+
+class _Ahead:
+    # view of a token stream shifted by `offset`, for lookahead
+    def __init__(self, tokens, offset):
+        self.tokens = tokens
+        self.offset = offset
+
+    def peek(self, offset=0):
+        return self.tokens.peek(self.offset + offset)
+
+
+def _epithet_node(tokens, kind):
+    word = tokens.take(kind)
+    if word.startswith(_hybrid):
+        word = word[1:]
+    node = {"string": word}
+    auth = _authorship(tokens)
+    if auth is not None:
+        node.update(auth)
+    normalized = [word] + ([auth["authorship"]] if auth else [])
+    return node, normalized
+
+
+def _parse(name):
+    tokens = _Tokens(name)
+    hybrid = False
+    if tokens.peek() == _hybrid:
+        tokens.take()
+        hybrid = True
+    first = tokens.peek()
+    if first is not None and first.startswith(_hybrid):
+        first = first[1:]
+        hybrid = True
+    if first is None or _genus.match(first) is None:
+        return None
+    start = str(tokens.items[tokens.i][1])
+    genus = tokens.take("genus").lstrip(_hybrid)
+    details = {"genus": {"string": genus}}
+    normalized = [genus]
+    canonical = [genus]
+
+    if (
+        tokens.peek() == "("
+        and tokens.peek(2) == ")"
+        and _genus.match(tokens.peek(1) or "")
+    ):
+        tokens.take()
+        sub = tokens.take("infragenus")
+        tokens.take()
+        details["infragenus"] = {"string": sub}
+        normalized.append(f"({sub})")
+
+    word = tokens.peek()
+    if word is not None and word.startswith(_hybrid) and _is_epithet(word[1:]):
+        hybrid = True
+        word = word[1:]
+    if not _is_epithet(word):
+        # uninomial
+        if "infragenus" not in details:
+            details = {"uninomial": details["genus"]}
+            tokens.positions[start][0] = "uninomial"
+        auth = _authorship(tokens)
+        if auth is not None:
+            details[next(iter(details))].update(auth)
+            normalized.append(auth["authorship"])
+    else:
+        details["species"], words = _epithet_node(tokens, "species")
+        normalized += words
+        canonical.append(details["species"]["string"])
+        infra = []
+        while tokens.peek() is not None:
+            word = tokens.peek()
+            rank = _ranks.get(word)
+            if rank is not None and _is_epithet(tokens.peek(1)):
+                tokens.take("infraspecific_type")
+            elif not _is_epithet(word):
+                break
+            node, words = _epithet_node(tokens, "infraspecies")
+            if rank is not None:
+                node["rank"] = rank
+                words = [rank] + words
+            infra.append(node)
+            normalized += words
+            canonical.append(node["string"])
+        if infra:
+            details["infraspecies"] = infra
+    if tokens.peek() is not None:
+        return None
+    return {
+        "canonical": " ".join(canonical),
+        "details": [details],
+        "hybrid": hybrid,
+        "normalized": " ".join(normalized),
+        "parsed": True,
+        "parser_run": 1,
+        "parser_version": parser_version,
+        "positions": tokens.positions,
+    }
+
+
+@lru_cache(maxsize=2**16)
+def _parse_cached(name):
+    out = _parse(name)
+    if out is None:
+        out = {
+            "parsed": False,
+            "parser_run": 1,
+            "parser_version": parser_version,
+        }
+    out["verbatim"] = name
+    return {"scientificName": out}
+
+
+def _copy(x):
+    # faster than copy.deepcopy for the dicts, lists and strings of a result
+    kind = type(x)
+    if kind is dict:
+        return {key: _copy(value) for key, value in x.items()}
+    if kind is list:
+        return [_copy(w) for w in x]
+    return x
+
+
+def parse_name(name):
+    """
+    Parse one scientific name locally
+
+    Results are cached, so repeated names are parsed once; each call gets
+    its own copy of the result.
+
+    :param name: (str) a scientific name, e.g. "Poa annua L."
+
+    :return: dict in the format of the Global Names parser, with the name in
+        ``scientificName``
+
+    Usage::
+
+        from pytaxize.gn import parser
+        parser.parse_name("Parus major Linnaeus, 1758")
+        parser.parse_name("Salix repens var. argentea (Sm.) Wimm. & Grab.")
+    """
+    return _copy(_parse_cached(name))
+
+
+def parse(names):
+    """
+    Parse scientific names locally, without the Global Names web service
+
+    Handles uninomials, binomials and trinomials with an optional subgenus,
+    infraspecific rank markers (e.g. ``var.``, ``subsp.``, ``f.``) and
+    authorship (basionym authors in parentheses, combination authors and
+    years). Names outside this grammar, e.g. hybrid formulae or names with
+    annotations such as "sp. nov.", come back with ``parsed`` False.
+
+    :param names: List of scientific names.
+
+    :return: list of dicts, one per name, in the format of `gni.parse`
+
+    Usage::
+
+        from pytaxize.gn import parser
+        parser.parse(["Cyanistes caeruleus", "Helianthus annuus L."])
+    """
+    return [parse_name(w) for w in names]
@@ -2,6 +2,7 @@ import warnings
 
 from pytaxize.itis import terms
 from pytaxize.ncbi import ncbi
+from pytaxize.utils import dedupe_names, fan_out
 
 from .format_helpers import _make_id
 from .gbif_helpers import gbif_query_for_single_name, process_gbif_response
@@ -46,6 +47,10 @@ class Ids:
         out = x.extract_ids()
         out["Echinacea"]
 
+        # repeated names (ignoring case and whitespace) are looked up once
+        x = Ids(name=['Poa annua', 'Poa annua', 'poa  annua'])
+        x.ncbi()
+
         # ITIS
         x = Ids("Helianthus annuus")
         x.itis(type="scientific")
@@ -66,8 +71,9 @@ class Ids:
 
     def ncbi(self):
         out = []
-        for i in range(len(self.name)):
-            fname = self.name[i]
+        names, index = dedupe_names(self.name)
+        for i in range(len(names)):
+            fname = names[i]
             res = ncbi.search(sci_com=fname)
             if len(res[fname]) == 0:
                 warnings.warn("No results for taxon '" + fname + "'")
@@ -84,14 +90,15 @@ class Ids:
                     ]
             out.append(result)
         self.db_ids = "ncbi"
-        self.ids = dict(zip(self.name, out))
+        self.ids = dict(zip(self.name, fan_out(out, index)))
 
     # FIXME: ITIS doesn't give back ranks, ideally need ranks
     def itis(self, type="scientific"):
         out = []
-        for i in range(len(self.name)):
-            fname = self.name[i]
-            res = terms(x=self.name, what=type)
+        names, index = dedupe_names(self.name)
+        for i in range(len(names)):
+            fname = names[i]
+            res = terms(x=fname, what=type)
             if len(res) == 0:
                 warnings.warn("No results for taxon '" + fname + "'")
                 result = [_make_id(None, fname, None, "itis")]
@@ -108,16 +115,14 @@ class Ids:
                     ]
             out.append(result)
         self.db_ids = "itis"
-        self.ids = dict(zip(self.name, out))
+        self.ids = dict(zip(self.name, fan_out(out, index)))
 
     def gbif(self, rank="species"):
         self.db_ids = "gbif"
-        response = map(lambda x: gbif_query_for_single_name(x, rank), self.name)
-        self.ids = dict(
-            zip(
-                self.name, list(map(lambda x: process_gbif_response(x, rank), response))
-            )
-        )
+        names, index = dedupe_names(self.name)
+        response = map(lambda x: gbif_query_for_single_name(x, rank), names)
+        out = list(map(lambda x: process_gbif_response(x, rank), response))
+        self.ids = dict(zip(self.name, fan_out(out, index)))
 
     def db(self, db, **kwargs):
         if db == "ncbi":
@@ -1,3 +1,4 @@
+from .database import ItisDatabase
 from .itis import (
     accepted_names,
     any_match_count,
@@ -20,13 +21,24 @@ from .itis import (
     jurisdiction_origin_values,
     jurisdiction_values,
     jurisdictional_origin,
+    memo_clear,
+    memo_info,
     rank_name,
+    search_any_match,
+    search_common,
+    search_scientific,
+    set_backend,
     terms,
 )
+from .itis_extra import batch, downstream
+from .record import TaxonRecord
 
 __all__ = [
+    "ItisDatabase",
+    "TaxonRecord",
     "accepted_names",
     "any_match_count",
+    "batch",
     "comment_detail",
     "common_names",
     "core_metadata",
@@ -35,6 +47,7 @@ __all__ = [
     "credibility_ratings",
     "currency",
     "date_data",
+    "downstream",
     "experts",
     "full_record",
     "geographic_divisions",
@@ -46,6 +59,12 @@ __all__ = [
     "jurisdiction_origin_values",
     "jurisdiction_values",
     "jurisdictional_origin",
+    "memo_clear",
+    "memo_info",
     "rank_name",
+    "search_any_match",
+    "search_common",
+    "search_scientific",
+    "set_backend",
     "terms",
 ]
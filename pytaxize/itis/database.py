@@ -0,0 +1,303 @@
+import sqlite3
+import threading
+
+_svc = "gov.usgs.itis.itis_service.data."
+
+_indexes = [
+    "CREATE INDEX IF NOT EXISTS ix_pytaxize_tu_parent ON taxonomic_units (parent_tsn)",
+    "CREATE INDEX IF NOT EXISTS ix_pytaxize_tu_name ON taxonomic_units (complete_name)",
+    "CREATE INDEX IF NOT EXISTS ix_pytaxize_vern_tsn ON vernaculars (tsn)",
+    "CREATE INDEX IF NOT EXISTS ix_pytaxize_vern_name ON vernaculars (vernacular_name)",
+    "CREATE INDEX IF NOT EXISTS ix_pytaxize_syn_tsn ON synonym_links (tsn)",
+]
+
+_taxon_sql = """
+    SELECT tu.tsn, tu.complete_name, tu.parent_tsn, tu.name_usage,
+        tu.kingdom_id, tu.rank_id, tut.rank_name, k.kingdom_name,
+        a.taxon_author, tu.credibility_rtng, tu.completeness_rtng,
+        tu.currency_rating
+    FROM taxonomic_units tu
+    LEFT JOIN taxon_unit_types tut
+        ON tut.kingdom_id = tu.kingdom_id AND tut.rank_id = tu.rank_id
+    LEFT JOIN kingdoms k ON k.kingdom_id = tu.kingdom_id
+    LEFT JOIN taxon_authors_lkp a ON a.taxon_author_id = tu.taxon_author_id
+"""
+
+_taxon_fields = [
+    "tsn",
+    "name",
+    "parent",
+    "usage",
+    "kingdom_id",
+    "rank_id",
+    "rank",
+    "kingdom",
+    "author",
+    "credibility",
+    "completeness",
+    "currency",
+]
+
+
+def _str(x):
+    return "" if x is None else str(x).strip()
+
+
+class ItisDatabase:
+    """
+    ItisDatabase: ITIS backend reading a local copy of the ITIS database
+
+    ITIS publishes its full database as a SQLite file (see
+    https://www.itis.gov/downloads/). Register it with `itis.set_backend`
+    and the supported ITIS functions query the file instead of the ITIS
+    web service, returning results of the same shape. Functions whose
+    endpoint is not in `endpoints` still use the web service.
+
+    :param path: path to the ITIS SQLite file
+    :param create_indexes: (bool) add the indexes needed for fast lookups,
+        if the file is writable
+
+    Usage::
+
+        from pytaxize import itis
+        db = itis.ItisDatabase("ITIS.sqlite")
+        itis.set_backend(db)
+        itis.hierarchy_full(180543)
+        itis.common_names(180543)
+        itis.terms("Ursus", what="scientific")
+        # back to the web service
+        itis.set_backend(None)
+    """
+
+    def __init__(self, path, create_indexes=True):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if create_indexes:
+            try:
+                for sql in _indexes:
+                    self._conn.execute(sql)
+                self._conn.commit()
+            except sqlite3.OperationalError:
+                pass
+        self.endpoints = {
+            "getAcceptedNamesFromTSN": self._accepted_names,
+            "getCommonNamesFromTSN": self._common_names,
+            "getCredibilityRatingFromTSN": self._credibility_rating,
+            "getCurrencyFromTSN": self._currency,
+            "getFullHierarchyFromTSN": self._hierarchy_full,
+            "getGlobalSpeciesCompletenessFromTSN": self._completeness,
+            "getHierarchyDownFromTSN": self._hierarchy_down,
+            "getHierarchyUpFromTSN": self._hierarchy_up,
+            "getITISTerms": lambda x: self._terms(x, scientific=True, common=True),
+            "getITISTermsFromCommonName": lambda x: self._terms(x, common=True),
+            "getITISTermsFromScientificName": lambda x: self._terms(x, scientific=True),
+            "getTaxonomicRankNameFromTSN": self._rank_name,
+        }
+
+    def __repr__(self):
+        return f"<{type(self).__name__}>\n  path: {self.path}"
+
+    def request(self, endpoint, payload):
+        """Answer an ITIS web service request with a response of the same shape"""
+        key = payload["srchKey"] if "srchKey" in payload else payload["tsn"]
+        return self.endpoints[endpoint](key)
+
+    def close(self):
+        self._conn.close()
+
+    def _query(self, sql, args=()):
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    def _taxon(self, tsn):
+        rows = self._query(_taxon_sql + " WHERE tu.tsn = ?", (int(tsn),))
+        return dict(zip(_taxon_fields, rows[0])) if rows else None
+
+    def _children(self, tsn):
+        rows = self._query(
+            _taxon_sql + " WHERE tu.parent_tsn = ? "
+            "AND tu.name_usage IN ('valid', 'accepted') ORDER BY tu.tsn",
+            (int(tsn),),
+        )
+        return [dict(zip(_taxon_fields, w)) for w in rows]
+
+    def _record(self, taxon, parent=None):
+        return {
+            "author": _str(taxon["author"]),
+            "class": _svc + "SvcHierarchyRecord",
+            "parentName": _str(parent["name"]) if parent else "",
+            "parentTsn": _str(parent["tsn"]) if parent else "",
+            "rankName": _str(taxon["rank"]),
+            "taxonName": _str(taxon["name"]),
+            "tsn": _str(taxon["tsn"]),
+        }
+
+    def _record_list(self, tsn, taxon, records):
+        return {
+            "author": _str(taxon["author"]) if taxon else "",
+            "class": _svc + "SvcHierarchyRecordList",
+            "hierarchyList": records if records else [None],
+            "rankName": _str(taxon["rank"]) if taxon else "",
+            "sciName": _str(taxon["name"]) if taxon else "",
+            "tsn": _str(tsn),
+        }
+
+    def _ancestors(self, taxon):
+        # the taxon and its parents, from the kingdom down
+        out = [taxon]
+        while out[-1]["parent"]:
+            parent = self._taxon(out[-1]["parent"])
+            if parent is None:
+                break
+            out.append(parent)
+        return out[::-1]
+
+    def _hierarchy_down(self, tsn):
+        taxon = self._taxon(tsn)
+        records = []
+        if taxon is not None:
+            records = [self._record(w, taxon) for w in self._children(tsn)]
+        return self._record_list(tsn, taxon, records)
+
+    def _hierarchy_full(self, tsn):
+        taxon = self._taxon(tsn)
+        records = []
+        if taxon is not None:
+            parent = None
+            for w in self._ancestors(taxon):
+                records.append(self._record(w, parent))
+                parent = w
+            records.extend(self._record(w, taxon) for w in self._children(tsn))
+        return self._record_list(tsn, taxon, records)
+
+    def _hierarchy_up(self, tsn):
+        taxon = self._taxon(tsn)
+        if taxon is None:
+            return self._record(
+                {"author": None, "rank": None, "name": None, "tsn": tsn}
+            )
+        parent = self._taxon(taxon["parent"]) if taxon["parent"] else None
+        return self._record(taxon, parent)
+
+    def _common_names(self, tsn):
+        rows = self._query(
+            "SELECT vernacular_name, language FROM vernaculars WHERE tsn = ? "
+            "ORDER BY vern_id",
+            (int(tsn),),
+        )
+        names = [
+            {
+                "class": _svc + "SvcCommonName",
+                "commonName": _str(name),
+                "language": _str(language),
+                "tsn": _str(tsn),
+            }
+            for name, language in rows
+        ]
+        return {
+            "class": _svc + "SvcCommonNameList",
+            "commonNames": names if names else [None],
+            "tsn": _str(tsn),
+        }
+
+    def _accepted_names(self, tsn):
+        rows = self._query(
+            "SELECT tsn_accepted FROM synonym_links WHERE tsn = ?", (int(tsn),)
+        )
+        names = []
+        for (accepted,) in rows:
+            taxon = self._taxon(accepted)
+            if taxon is not None:
+                names.append(
+                    {
+                        "acceptedName": _str(taxon["name"]),
+                        "acceptedTsn": _str(taxon["tsn"]),
+                        "author": _str(taxon["author"]),
+                        "class": _svc + "SvcAcceptedName",
+                    }
+                )
+        return {
+            "acceptedNames": names if names else [None],
+            "class": _svc + "SvcAcceptedNameList",
+            "tsn": _str(tsn),
+        }
+
+    def _rank_name(self, tsn):
+        taxon = self._taxon(tsn) or dict.fromkeys(_taxon_fields)
+        return {
+            "class": _svc + "SvcTaxonRankInfo",
+            "kingdomId": _str(taxon["kingdom_id"]),
+            "kingdomName": _str(taxon["kingdom"]),
+            "rankId": _str(taxon["rank_id"]),
+            "rankName": _str(taxon["rank"]),
+            "tsn": _str(tsn),
+        }
+
+    def _credibility_rating(self, tsn):
+        taxon = self._taxon(tsn) or dict.fromkeys(_taxon_fields)
+        return {
+            "class": _svc + "SvcCredibilityData",
+            "credRating": _str(taxon["credibility"]),
+            "tsn": _str(tsn),
+        }
+
+    def _currency(self, tsn):
+        taxon = self._taxon(tsn) or dict.fromkeys(_taxon_fields)
+        return {
+            "class": _svc + "SvcCurrencyData",
+            "rankId": taxon["rank_id"] or 0,
+            "taxonCurrency": _str(taxon["currency"]),
+            "tsn": _str(tsn),
+        }
+
+    def _completeness(self, tsn):
+        taxon = self._taxon(tsn) or dict.fromkeys(_taxon_fields)
+        return {
+            "class": _svc + "SvcGlobalSpeciesCompleteness",
+            "completeness": _str(taxon["completeness"]),
+            "rankId": taxon["rank_id"] or 0,
+            "tsn": _str(tsn),
+        }
+
+    def _terms(self, x, scientific=False, common=False):
+        tsns = []
+        if scientific:
+            tsns += self._query(
+                "SELECT tsn FROM taxonomic_units WHERE complete_name LIKE ? "
+                "ORDER BY complete_name",
+                (f"%{x}%",),
+            )
+        if common:
+            tsns += self._query(
+                "SELECT DISTINCT tsn FROM vernaculars WHERE vernacular_name LIKE ? "
+                "ORDER BY vernacular_name",
+                (f"%{x}%",),
+            )
+        terms = []
+        seen = set()
+        for (tsn,) in tsns:
+            taxon = self._taxon(tsn)
+            if tsn in seen or taxon is None:
+                continue
+            seen.add(tsn)
+            names = self._query(
+                "SELECT vernacular_name FROM vernaculars WHERE tsn = ? "
+                "ORDER BY vern_id",
+                (tsn,),
+            )
+            terms.append(
+                {
+                    "author": _str(taxon["author"]),
+                    "class": _svc + "SvcItisTerm",
+                    "commonNames": [_str(w[0]) for w in names] or [None],
+                    "nameUsage": _str(taxon["usage"]),
+                    "scientificName": _str(taxon["name"]),
+                    "tsn": _str(tsn),
+                }
+            )
+        return {
+            "class": _svc + "SvcItisTermList",
+            "itisTerms": terms if terms else [None],
+            "requestedName": x,
+        }
@@ -1,13 +1,197 @@
+import copy
+import json
+import os
 import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 
 import polars as pl
 
+from pytaxize.cache import cache_dir
+from pytaxize.lineage import itis_ancestors
 from pytaxize.refactor import Refactor
+from pytaxize.utils import in_context
 
 itis_base = "http://www.itis.gov/ITISWebService/jsonservice/"
 
 
+class _TsnMemo:
+    """Thread-safe LRU store of raw ITIS responses keyed on (endpoint, tsn)"""
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_memo = _TsnMemo()
+
+# local data source answering ITIS web service requests, see set_backend
+_backend = None
+
+
+def _backend_get(endpt, payload):
+    if _backend is None or endpt not in _backend.endpoints:
+        return None
+    return _backend.request(endpt, payload)
+
+
+def _tsn_get(endpt, tsn, **kwargs):
+    out = _backend_get(endpt, {"tsn": tsn})
+    if out is not None:
+        return out
+    key = (endpt, str(tsn))
+    out = _memo.get(key)
+    if out is None:
+        out = Refactor(itis_base + endpt, payload={"tsn": tsn}, request="get").json(
+            **kwargs
+        )
+        _memo.set(key, out)
+    # callers pop keys off the response, so never hand out the memoized object
+    return copy.deepcopy(out)
+
+
+def memo_info():
+    """
+    Get statistics of the in-memory memo of per-TSN ITIS responses
+
+    :return: dict with ``hits``, ``misses``, ``size`` and ``maxsize``
+
+    Usage::
+
+        from pytaxize import itis
+        itis.rank_name(202385)
+        itis.rank_name(202385)
+        itis.memo_info()
+    """
+    return {
+        "hits": _memo.hits,
+        "misses": _memo.misses,
+        "size": len(_memo._data),
+        "maxsize": _memo.maxsize,
+    }
+
+
+def memo_clear(maxsize=None):
+    """
+    Empty the in-memory memo of per-TSN ITIS responses
+
+    :param maxsize: (int) optionally set a new maximum number of memoized
+        responses; 0 turns memoization off
+
+    Usage::
+
+        from pytaxize import itis
+        itis.memo_clear()
+        itis.memo_clear(maxsize=100000)
+    """
+    _memo.clear()
+    if maxsize is not None:
+        _memo.maxsize = maxsize
+
+
+class _ReferenceTables:
+    """
+    ITIS reference vocabularies, held in memory and persisted as JSON files
+    in `pytaxize.cache.cache_dir` so that they are fetched once per `ttl`
+    """
+
+    def __init__(self, ttl=30 * 86400):
+        self.ttl = ttl
+        self._data = {}
+        # one lock per endpoint, so vocabularies are fetched independently
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _path(self, endpt):
+        return os.path.join(cache_dir(), f"itis_{endpt}.json")
+
+    def _load(self, endpt):
+        try:
+            with open(self._path(endpt)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, endpt, entry):
+        # without a writable cache directory, tables are kept in memory only
+        try:
+            path = self._path(endpt)
+            with open(path + ".tmp", "w") as f:
+                json.dump(entry, f)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            pass
+
+    def get(self, endpt, refresh=False, **kwargs):
+        with self._lock:
+            lock = self._locks.setdefault(endpt, threading.Lock())
+        with lock:
+            entry = None if refresh else self._data.get(endpt) or self._load(endpt)
+            if entry is None or time.time() - entry["fetched"] > self.ttl:
+                out = Refactor(itis_base + endpt, payload={}, request="get").json(
+                    **kwargs
+                )
+                entry = {"fetched": time.time(), "response": out}
+                self._save(endpt, entry)
+            self._data[endpt] = entry
+        return copy.deepcopy(entry["response"])
+
+
+_reference = _ReferenceTables()
+
+
+def set_backend(backend=None):
+    """
+    Answer ITIS requests from a local data source instead of the web service
+
+    :param backend: an object with an ``endpoints`` collection of ITIS web
+        service method names and a ``request(endpoint, payload)`` method
+        returning the web service JSON for them, e.g. `itis.ItisDatabase`;
+        None goes back to the web service for every request
+
+    Usage::
+
+        from pytaxize import itis
+        itis.set_backend(itis.ItisDatabase("ITIS.sqlite"))
+        itis.hierarchy_down(179913)
+        itis.set_backend(None)
+    """
+    global _backend
+    _backend = backend
+    _memo.clear()
+    itis_ancestors.clear()
+
+
 def accepted_names(tsn, **kwargs):
     """
     Get accepted names from tsn
@@ -23,9 +207,11 @@ def accepted_names(tsn, **kwargs):
         # TSN not accepted - input TSN is old name
         itis.accepted_names(tsn=504239)
     """
-    out = Refactor(
-        itis_base + "getAcceptedNamesFromTSN", payload={"tsn": tsn}, request="get"
-    ).json(**kwargs)
+    out = _tsn_get("getAcceptedNamesFromTSN", tsn, **kwargs)
+    return _accepted_names(out)
+
+
+def _accepted_names(out):
     if out["acceptedNames"][0] is None:
         return {}
     else:
@@ -65,11 +251,13 @@ def comment_detail(tsn, as_dataframe=False, **kwargs):
         from pytaxize import itis
         itis.comment_detail(tsn=180543)
     """
-    out = Refactor(
-        itis_base + "getCommentDetailFromTSN", payload={"tsn": tsn}, request="get"
-    ).json(**kwargs)
-    [z.pop("class") for z in out["comments"]]
-    return _df(out["comments"], as_dataframe)
+    out = _tsn_get("getCommentDetailFromTSN", tsn, **kwargs)
+    return _comment_detail(out, as_dataframe)
+
+
+def _comment_detail(out, as_dataframe=False):
+    [z.pop("class") for z in out["comments"] if z is not None]
+    return _df(out["comments"], as_dataframe, "comment_detail")
 
 
 def common_names(tsn, as_dataframe=False, **kwargs):
@@ -87,12 +275,14 @@ def common_names(tsn, as_dataframe=False, **kwargs):
         # no common names
         itis.common_names(tsn=726872)
     """
-    out = Refactor(
-        itis_base + "getCommonNamesFromTSN", payload={"tsn": tsn}, request="get"
-    ).json(**kwargs)
+    out = _tsn_get("getCommonNamesFromTSN", tsn, **kwargs)
+    return _common_names(out, as_dataframe)
+
+
+def _common_names(out, as_dataframe=False):
     if out["commonNames"][0] is not None:
         [z.pop("class") for z in out["commonNames"]]
-    return _df(out["commonNames"], as_dataframe)
+    return _df(out["commonNames"], as_dataframe, "common_names")
 
 
 def core_metadata(tsn, as_dataframe=False, **kwargs):
@@ -111,11 +301,13 @@ def core_metadata(tsn, as_dataframe=False, **kwargs):
         # no coverage or currrency data
         itis.core_metadata(tsn=183671)
     """
-    out = Refactor(
-        itis_base + "getCoreMetadataFromTSN", payload={"tsn": tsn}, request="get"
-    ).json(**kwargs)
+    out = _tsn_get("getCoreMetadataFromTSN", tsn, **kwargs)
+    return _core_metadata(out, as_dataframe)
+
+
+def _core_metadata(out, as_dataframe=False):
     out.pop("class")
-    return _df([out], as_dataframe)
+    return _df([out], as_dataframe, "core_metadata")
 
 
 def coverage(tsn, as_dataframe=False, **kwargs):
@@ -136,11 +328,9 @@ def coverage(tsn, as_dataframe=False, **kwargs):
         # as data_frame
         itis.coverage(526852, as_dataframe=True)
     """
-    out = Refactor(
-        itis_base + "getCoverageFromTSN", payload={"tsn": tsn}, request="get"
-    ).json(**kwargs)
+    out = _tsn_get("getCoverageFromTSN", tsn, **kwargs)
     out.pop("class")
-    return _df(out, as_dataframe)
+    return _df(out, as_dataframe, "coverage")
 
 
 def credibility_rating(tsn, as_dataframe=False, **kwargs):
@@ -157,17 +347,23 @@ def credibility_rating(tsn, as_dataframe=False, **kwargs):
         itis.credibility_rating(tsn=526852)
         itis.credibility_rating(28727)
     """
-    out = Refactor(
-        itis_base + "getCredibilityRatingFromTSN", payload={"tsn": tsn}, request="get"
-    ).json(**kwargs)
+    out = _tsn_get("getCredibilityRatingFromTSN", tsn, **kwargs)
+    return _credibility_rating(out, as_dataframe)
+
+
+def _credibility_rating(out, as_dataframe=False):
     out.pop("class")
-    return _df(out, as_dataframe)
+    return _df(out, as_dataframe, "credibility_rating")
 
 
-def credibility_ratings(**kwargs):
+def credibility_ratings(refresh=False, **kwargs):
     """
     Get possible credibility ratings
 
+    The values are fetched once and kept on disk for 30 days, see
+    `pytaxize.cache.cache_dir`
+
+    :param refresh: (bool) fetch the values again from ITIS
     :param **kwargs: Curl options passed on to `requests.get`
     :return: a dict
 
@@ -175,10 +371,9 @@ def credibility_ratings(**kwargs):
 
         from pytaxize import itis
         itis.credibility_ratings()
+        itis.credibility_ratings(refresh=True)
     """
-    out = Refactor(itis_base + "getCredibilityRatings", payload={}, request="get").json(
-        **kwargs
-    )
+    out = _reference.get("getCredibilityRatings", refresh, **kwargs)
     out.pop("class")
     return out["credibilityValues"]
 
@@ -201,11 +396,13 @@ def currency(tsn, as_dataframe=False, **kwargs):
         # as data_frame
         itis.currency(526852, as_dataframe=True)
     """
-    out = Refactor(
-        itis_base + "getCurrencyFromTSN", payload={"tsn": tsn}, request="get"
-    ).json(**kwargs)
+    out = _tsn_get("getCurrencyFromTSN", tsn, **kwargs)
+    return _currency(out, as_dataframe)
+
+
+def _currency(out, as_dataframe=False):
     out.pop("class")
-    return _df(out, as_dataframe)
+    return _df(out, as_dataframe, "currency")
 
 
 def date_data(tsn, as_dataframe=False, **kwargs):
@@ -221,11 +418,13 @@ def date_data(tsn, as_dataframe=False, **kwargs):
         from pytaxize import itis
         itis.date_data(tsn=180543)
     """
-    out = Refactor(
-        itis_base + "getDateDataFromTSN", payload={"tsn": tsn}, request="get"
-    ).json(**kwargs)
+    out = _tsn_get("getDateDataFromTSN", tsn, **kwargs)
+    return _date_data(out, as_dataframe)
+
+
+def _date_data(out, as_dataframe=False):
     out.pop("class")
-    return _df(out, as_dataframe)
+    return _df(out, as_dataframe, "date_data")
 
 
 def experts(tsn, as_dataframe=False, **kwargs):
@@ -241,11 +440,13 @@ def experts(tsn, as_dataframe=False, **kwargs):
         from pytaxize import itis
         itis.experts(tsn=180544)
     """
-    out = Refactor(
-        itis_base + "getExpertsFromTSN", payload={"tsn": tsn}, request="get"
-    ).json(**kwargs)
+    out = _tsn_get("getExpertsFromTSN", tsn, **kwargs)
+    return _experts(out, as_dataframe)
+
+
+def _experts(out, as_dataframe=False):
     out.pop("class")
-    return _df(out["experts"], as_dataframe)
+    return _df(out["experts"], as_dataframe, "experts")
 
 
 def rank_name(tsn, as_dataframe=False, **kwargs):
@@ -261,11 +462,13 @@ def rank_name(tsn, as_dataframe=False, **kwargs):
         from pytaxize import itis
         itis.rank_name(tsn = 202385)
     """
-    tt = Refactor(
-        itis_base + "getTaxonomicRankNameFromTSN", payload={"tsn": tsn}, request="get"
-    ).json(**kwargs)
-    tt.pop("class")
-    return _df(tt, as_dataframe)
+    out = _tsn_get("getTaxonomicRankNameFromTSN", tsn, **kwargs)
+    return _rank_name(out, as_dataframe)
+
+
+def _rank_name(out, as_dataframe=False):
+    out.pop("class")
+    return _df(out, as_dataframe, "rank_name")
 
 
 def hierarchy_full(tsn, as_dataframe=False, **kwargs):
@@ -284,12 +487,21 @@ def hierarchy_full(tsn, as_dataframe=False, **kwargs):
         # as data_frame
         itis.hierarchy_full(tsn = 100800, as_dataframe=True)
     """
-    tt = Refactor(
-        itis_base + "getFullHierarchyFromTSN", payload={"tsn": tsn}, request="get"
-    ).json(**kwargs)
+    tt = _tsn_get("getFullHierarchyFromTSN", tsn, **kwargs)
     hier = tt["hierarchyList"]
     [z.pop("class") for z in hier if z is not None]
-    return _df(hier, as_dataframe)
+    _remember(hier)
+    return _df(hier, as_dataframe, "hierarchy_full")
+
+
+def _remember(records):
+    # feed hierarchy records to the shared store of known ancestors, when
+    # a caller asked for it
+    if not itis_ancestors.recording:
+        return
+    for z in records:
+        if z is not None and z.get("taxonName"):
+            itis_ancestors.add(z["tsn"], z.get("parentTsn"), z)
 
 
 # def _fullrecord(verb, args, **kwargs):
@@ -350,7 +562,7 @@ def full_record(tsn=None, lsid=None, **kwargs):
         itis.full_record(lsid="urn:lsid:itis.gov:itis_tsn:100800")
     """
     if tsn is not None:
-        return _fullrecord("getFullRecordFromTSN", {"tsn": tsn}, **kwargs)
+        return _tsn_get("getFullRecordFromTSN", tsn, **kwargs)
     if lsid is not None:
         return _fullrecord("getFullRecordFromLSID", {"lsid": lsid}, **kwargs)
 
@@ -368,18 +580,24 @@ def geographic_divisions(tsn, as_dataframe=False, **kwargs):
         from pytaxize import itis
         itis.geographic_divisions(tsn=180543)
     """
-    out = Refactor(
-        itis_base + "getGeographicDivisionsFromTSN", payload={"tsn": tsn}, request="get"
-    ).json(**kwargs)
+    out = _tsn_get("getGeographicDivisionsFromTSN", tsn, **kwargs)
+    return _geographic_divisions(out, as_dataframe)
+
+
+def _geographic_divisions(out, as_dataframe=False):
     out.pop("class")
-    [z.pop("class") for z in out["geoDivisions"]]
-    return _df(out["geoDivisions"], as_dataframe)
+    [z.pop("class") for z in out["geoDivisions"] if z is not None]
+    return _df(out["geoDivisions"], as_dataframe, "geographic_divisions")
 
 
-def geographic_values(**kwargs):
+def geographic_values(refresh=False, **kwargs):
     """
     Get all possible geographic values
 
+    The values are fetched once and kept on disk for 30 days, see
+    `pytaxize.cache.cache_dir`
+
+    :param refresh: (bool) fetch the values again from ITIS
     :param **kwargs: Curl options passed on to `requests.get`
 
     Usage::
@@ -387,7 +605,7 @@ def geographic_values(**kwargs):
         from pytaxize import itis
         itis.geographic_values()
     """
-    out = Refactor(itis_base + "getGeographicValues", payload={}, request="get").json()
+    out = _reference.get("getGeographicValues", refresh, **kwargs)
     return out["geographicValues"]
 
 
@@ -404,13 +622,13 @@ def global_species_completeness(tsn, as_dataframe=False, **kwargs):
         from pytaxize import itis
         itis.global_species_completeness(180541)
     """
-    out = Refactor(
-        itis_base + "getGlobalSpeciesCompletenessFromTSN",
-        payload={"tsn": tsn},
-        request="get",
-    ).json(**kwargs)
+    out = _tsn_get("getGlobalSpeciesCompletenessFromTSN", tsn, **kwargs)
+    return _global_species_completeness(out, as_dataframe)
+
+
+def _global_species_completeness(out, as_dataframe=False):
     out.pop("class")
-    return _df(out, as_dataframe)
+    return _df(out, as_dataframe, "global_species_completeness")
 
 
 def hierarchy_down(tsn, as_dataframe=False, **kwargs):
@@ -428,14 +646,13 @@ def hierarchy_down(tsn, as_dataframe=False, **kwargs):
         itis.hierarchy_down(tsn = 161994)
         itis.hierarchy_down(tsn = 9999999)
     """
-    tt = Refactor(
-        itis_base + "getHierarchyDownFromTSN", payload={"tsn": tsn}, request="get"
-    ).json(**kwargs)
+    tt = _tsn_get("getHierarchyDownFromTSN", tsn, **kwargs)
     tt.pop("class")
     if tt["hierarchyList"]:
         pass
     [z.pop("class") for z in tt["hierarchyList"] if z is not None]
-    return _df(tt["hierarchyList"], as_dataframe)
+    _remember(tt["hierarchyList"])
+    return _df(tt["hierarchyList"], as_dataframe, "hierarchy_down")
 
 
 def hierarchy_up(tsn, as_dataframe=False, **kwargs):
@@ -452,19 +669,24 @@ def hierarchy_up(tsn, as_dataframe=False, **kwargs):
         itis.hierarchy_up(tsn = 36485)
         itis.hierarchy_up(tsn = 37906)
     """
-    tt = Refactor(
-        itis_base + "getHierarchyUpFromTSN", payload={"tsn": tsn}, request="get"
-    ).json(**kwargs)
-    tt.pop("class")
-    return _df(tt, as_dataframe)
+    out = _tsn_get("getHierarchyUpFromTSN", tsn, **kwargs)
+    return _hierarchy_up(out, as_dataframe)
+
+
+def _hierarchy_up(out, as_dataframe=False):
+    out.pop("class")
+    _remember([out])
+    return _df(out, as_dataframe, "hierarchy_up")
 
 
 def _itisterms(endpt, args={}, as_dataframe=False, **kwargs):
-    out = Refactor(itis_base + endpt, payload=args, request="get").json(**kwargs)
+    out = _backend_get(endpt, args)
+    if out is None:
+        out = Refactor(itis_base + endpt, payload=args, request="get").json(**kwargs)
     if out["itisTerms"][0] is None:
         return {}
     [w.pop("class") for w in out["itisTerms"]]
-    return _df(out["itisTerms"], as_dataframe)
+    return _df(out["itisTerms"], as_dataframe, "terms")
 
 
 def _get_text_single(x):
@@ -505,6 +727,132 @@ def terms(x, what="both", as_dataframe=False, **kwargs):
     )
 
 
+def search_any_match(x, page_size=100, ascend=True, **kwargs):
+    """
+    Search for any match of a name or TSN, page by page
+
+    Pages are requested from ITIS as the results are consumed, the next page
+    being fetched in the background while the current one is read, so at
+    most two pages are held in memory at a time.
+
+    :param x: query term, a scientific or common name, or a TSN
+    :param page_size: (int) number of records per request
+    :param ascend: (bool) sort ascending (True) or descending (False)
+    :param **kwargs: Curl options passed on to `requests.get`
+
+    :return: generator of dicts, with the common names of each match in a
+        list under ``commonNames``
+
+    Usage::
+
+        from pytaxize import itis
+        for x in itis.search_any_match("dolphin"):
+            print(x["sciName"])
+        # broad searches are not fetched up front
+        res = itis.search_any_match("Zy", page_size=500)
+        next(res)
+        res.close()
+    """
+
+    def fetch(page):
+        args = {
+            "srchKey": x,
+            "pageSize": page_size,
+            "pageNum": page,
+            "ascend": str(ascend).lower(),
+        }
+        out = Refactor(
+            itis_base + "searchForAnyMatchPaged", payload=args, request="get"
+        ).json(**kwargs)
+        return [_any_match(w) for w in out["anyMatchList"] if w is not None]
+
+    fetch = in_context(fetch)
+    pool = ThreadPoolExecutor(1)
+    try:
+        page = 1
+        nxt = pool.submit(fetch, page)
+        while nxt is not None:
+            records = nxt.result()
+            page += 1
+            nxt = pool.submit(fetch, page) if len(records) >= page_size else None
+            yield from records
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _any_match(z):
+    z.pop("class")
+    names = (z.pop("commonNameList", None) or {}).get("commonNames") or []
+    z["commonNames"] = [w for w in names if w is not None]
+    [w.pop("class") for w in z["commonNames"]]
+    return z
+
+
+def search_common(x, which="exact", **kwargs):
+    """
+    Search for TSNs by common name
+
+    ITIS does not page these searches, so each is a single request, but
+    records are yielded one at a time.
+
+    :param x: query term
+    :param which: One of exact (common names equal to `x`), begin (common
+        names beginning with `x`), or end (common names ending with `x`)
+    :param **kwargs: Curl options passed on to `requests.get`
+
+    :return: generator of dicts with the fields ``commonName``,
+        ``language``, and ``tsn``
+
+    Usage::
+
+        from pytaxize import itis
+        list(itis.search_common("polar bear"))
+        list(itis.search_common("inch", which="begin"))
+        list(itis.search_common("snake", which="end"))
+    """
+
+    class Endpts(Enum):
+        exact = "searchByCommonName"
+        begin = "searchByCommonNameBeginsWith"
+        end = "searchByCommonNameEndsWith"
+
+    out = Refactor(
+        itis_base + Endpts[which].value, payload={"srchKey": x}, request="get"
+    ).json(**kwargs)
+    for z in out["commonNames"]:
+        if z is not None:
+            z.pop("class")
+            yield z
+
+
+def search_scientific(x, **kwargs):
+    """
+    Search for TSNs by scientific name
+
+    ITIS does not page this search, so it is a single request, but records
+    are yielded one at a time.
+
+    :param x: query term
+    :param **kwargs: Curl options passed on to `requests.get`
+
+    :return: generator of dicts, with fields including ``combinedName``,
+        ``author``, ``kingdom`` and ``tsn``
+
+    Usage::
+
+        from pytaxize import itis
+        list(itis.search_scientific("Tardigrada"))
+        list(itis.search_scientific("Quercus douglasii"))
+    """
+    out = Refactor(
+        itis_base + "searchByScientificName", payload={"srchKey": x}, request="get"
+    ).json(**kwargs)
+    for z in out["scientificNames"]:
+        if z is not None:
+            z.pop("class")
+            yield z
+
+
 # def hierarchy(tsn=None, what="full"):
 #     """
 #     Get hierarchies from TSN values, full, upstream only, or immediate downstream
@@ -560,22 +908,26 @@ def jurisdictional_origin(tsn, as_dataframe=False, **kwargs):
         itis.jurisdictional_origin(180543)
         itis.jurisdictional_origin(180543, True)
     """
-    out = Refactor(
-        itis_base + "getJurisdictionalOriginFromTSN",
-        payload={"tsn": tsn},
-        request="get",
-    ).json(**kwargs)
+    out = _tsn_get("getJurisdictionalOriginFromTSN", tsn, **kwargs)
+    return _jurisdictional_origin(out, as_dataframe)
+
+
+def _jurisdictional_origin(out, as_dataframe=False):
     out.pop("class")
     if out["jurisdictionalOrigins"][0] is not None:
         [z.pop("class") for z in out["jurisdictionalOrigins"]]
-    return _df(out["jurisdictionalOrigins"], as_dataframe)
+    return _df(out["jurisdictionalOrigins"], as_dataframe, "jurisdictional_origin")
 
 
-def jurisdiction_origin_values(as_dataframe=False, **kwargs):
+def jurisdiction_origin_values(as_dataframe=False, refresh=False, **kwargs):
     """
     Get jurisdiction origin values
 
+    The values are fetched once and kept on disk for 30 days, see
+    `pytaxize.cache.cache_dir`
+
     :param as_dataframe: (bool) specify return type, if pandas is available
+    :param refresh: (bool) fetch the values again from ITIS
     :param **kwargs: Curl options passed on to `requests.get`
 
     Usage::
@@ -583,18 +935,20 @@ def jurisdiction_origin_values(as_dataframe=False, **kwargs):
         from pytaxize import itis
         itis.jurisdiction_origin_values()
     """
-    out = Refactor(
-        itis_base + "getJurisdictionalOriginValues", payload={}, request="get"
-    ).json(**kwargs)
+    out = _reference.get("getJurisdictionalOriginValues", refresh, **kwargs)
     out.pop("class")
     [z.pop("class") for z in out["originValues"]]
-    return _df(out["originValues"], as_dataframe)
+    return _df(out["originValues"], as_dataframe, "jurisdiction_origin_values")
 
 
-def jurisdiction_values(**kwargs):
+def jurisdiction_values(refresh=False, **kwargs):
     """
     Get possible jurisdiction values
 
+    The values are fetched once and kept on disk for 30 days, see
+    `pytaxize.cache.cache_dir`
+
+    :param refresh: (bool) fetch the values again from ITIS
     :param **kwargs: Curl options passed on to `requests.get`
 
     :return: list
@@ -604,9 +958,7 @@ def jurisdiction_values(**kwargs):
         from pytaxize import itis
         itis.jurisdiction_values()
     """
-    out = Refactor(itis_base + "getJurisdictionValues", payload={}, request="get").json(
-        **kwargs
-    )
+    out = _reference.get("getJurisdictionValues", refresh, **kwargs)
     out.pop("class")
     return out["jurisdictionValues"]
 
@@ -977,145 +1329,6 @@ def jurisdiction_values(**kwargs):
 #     return _itisdf(out, ns23, matches, _tolower(matches), "ax23")
 
 
-# def searchbycommonname(x, **kwargs):
-#     """
-#     Search for tsn by common name
-
-#     Usage::
-
-#         from pytaxize import itis
-#         itis.searchbycommonname(x="american bullfrog")
-#         itis.searchbycommonname("ferret-badger")
-#         itis.searchbycommonname("polar bear")
-#     """
-#     out = Refactor(
-#         itis_base + "searchByCommonName", payload={"srchKey": x}, request="get"
-#     ).json(**kwargs)
-#     matches = ["commonName", "language", "tsn"]
-#     tmp = out.xpath("//ax21:commonNames", namespaces=ns21)
-#     return _itisdf(tmp[0], ns21, matches, _tolower(matches))
-
-
-# def searchbycommonnamebeginswith(x, **kwargs):
-#     """
-#     Search for tsn by common name beginning with
-
-#     Usage::
-
-#         from pytaxize import itis
-#         itis.searchbycommonnamebeginswith("inch")
-#     """
-#     out = Refactor(
-#         itis_base + "searchByCommonNameBeginsWith",
-#         payload={"srchKey": x},
-#         request="get",
-#     ).json(**kwargs)
-#     matches = ["commonName", "language", "tsn"]
-#     tmp = out.xpath("//ax21:commonNames", namespaces=ns21)
-#     return _itisdf(tmp[0], ns21, matches, _tolower(matches))
-
-
-# def searchbycommonnameendswith(x, **kwargs):
-#     """
-#     Search for tsn by common name ending with
-
-#     Usage::
-
-#         from pytaxize import itis
-#         itis.searchbycommonnameendswith("snake")
-#     """
-#     out = Refactor(
-#         itis_base + "searchByCommonNameEndsWith", payload={"srchKey": x}, request="get"
-#     ).json(**kwargs)
-#     matches = ["commonName", "language", "tsn"]
-#     tmp = out.xpath("//ax21:commonNames", namespaces=ns21)
-#     return _itisdf(tmp[0], ns21, matches, _tolower(matches))
-
-
-# def searchcommon(x, which="begin", **kwargs):
-#     """
-#     Searches common name and acts as thin wrapper around
-#     `itis.searchbycommonnamebeginswith` and `itis.searchbycommonnameendswith`
-
-#     Usage::
-
-#         from pytaxize import itis
-#         itis.searchcommon("inch")
-#         itis.searchcommon("inch", which = "end")
-#     """
-#     if which == "begin":
-#         return searchbycommonnamebeginswith(x, **kwargs)
-#     else:
-#         return searchbycommonnameendswith(x, **kwargs)
-
-
-# def searchbyscientificname(x, **kwargs):
-#     """
-#     Search by scientific name
-
-#     Usage::
-
-#         from pytaxize import itis
-#         itis.searchbyscientificname(x="Tardigrada")
-#         itis.searchbyscientificname("Quercus douglasii")
-#     """
-#     out = Refactor(
-#         itis_base + "searchByScientificName", payload={"srchKey": x}, request="get"
-#     ).json(**kwargs)
-#     matches = ["combinedName", "tsn"]
-#     return _itisdf(out, ns21, matches, _tolower(matches))
-
-
-# def searchforanymatch(x, **kwargs):
-#     """
-#     Search for any match
-
-#     Usage::
-
-#         from pytaxize import itis
-#         itis.searchforanymatch(x=202385)
-#         itis.searchforanymatch(x="dolphin")
-#     """
-#     out = Refactor(
-#         itis_base + "searchForAnyMatch", payload={"srchKey": x}, request="get"
-#     ).json(**kwargs)
-#     # if isinstance(x, basestring):
-#     tmp = out.getchildren()[0].getchildren()
-#     output = []
-#     for v in tmp:
-#         tmp = v.getchildren()
-#         for w in tmp:
-#             output.append(
-#                 dict(zip([gettag(e) for e in w.iter()], [e.text for e in w.iter()]))
-#             )
-#     return output
-
-
-# def searchforanymatchpaged(x, pagesize, pagenum, ascend, **kwargs):
-#     """
-#     Search for any matched page for descending (logical)
-
-#     Usage::
-
-#         from pytaxize import itis
-#         itis.searchforanymatchpaged(x=202385, pagesize=100, pagenum=1, ascend=False)
-#         itis.searchforanymatchpaged("Zy", pagesize=100, pagenum=1, ascend=False)
-#     """
-#     args = {"srchKey": x, "pageSize": pagesize, "pageNum": pagenum, "ascend": ascend}
-#     out = Refactor(
-#         itis_base + "searchForAnyMatchPaged", payload=args, request="get"
-#     ).json(**kwargs)
-#     tmp = out.getchildren()[0].getchildren()
-#     output = []
-#     for v in tmp:
-#         tmp = v.getchildren()
-#         for w in tmp:
-#             output.append(
-#                 dict(zip([gettag(e) for e in w.iter()], [e.text for e in w.iter()]))
-#             )
-#     return output
-
-
 ## helper functions and variables
 def convertsingle(x):
     if x.__class__.__name__ == "int":
@@ -1245,14 +1458,103 @@ def gettag(y):
     return y.tag.split("}")[1]
 
 
-def _df(x, as_dataframe=False):
-    if as_dataframe and pd:
-        if isinstance(x, dict):
-            x = [x]
-        df = pl.DataFrame.from_records(x)
-        return df
-    else:
-        return x
+_str = pl.String
+_int = pl.Int64
+_hierarchy_record = {
+    "author": _str,
+    "parentName": _str,
+    "parentTsn": _int,
+    "rankName": _str,
+    "taxonName": _str,
+    "tsn": _int,
+}
+
+# declared column types of the data frames returned by each ITIS function;
+# keys a response has beyond these are appended with inferred types
+_schemas = {
+    "comment_detail": {
+        "commentDetail": _str,
+        "commentId": _int,
+        "commentTimeStamp": _str,
+        "commentator": _str,
+        "updateDate": _str,
+    },
+    "common_names": {"commonName": _str, "language": _str, "tsn": _int},
+    "core_metadata": {
+        "credRating": _str,
+        "rankId": _int,
+        "taxonCoverage": _str,
+        "taxonCurrency": _str,
+        "taxonUsageRating": _str,
+        "tsn": _int,
+        "unacceptReason": _str,
+    },
+    "coverage": {"rankId": _int, "taxonCoverage": _str, "tsn": _int},
+    "credibility_rating": {"credRating": _str, "tsn": _int},
+    "currency": {"rankId": _int, "taxonCurrency": _str, "tsn": _int},
+    "date_data": {"initialTimeStamp": _str, "tsn": _int, "updateDate": _str},
+    "experts": {"comment": _str, "expert": _str, "updateDate": _str},
+    "geographic_divisions": {"geographicValue": _str, "updateDate": _str},
+    "global_species_completeness": {
+        "completeness": _str,
+        "rankId": _int,
+        "tsn": _int,
+    },
+    "hierarchy_down": _hierarchy_record,
+    "hierarchy_full": _hierarchy_record,
+    "hierarchy_up": _hierarchy_record,
+    "jurisdiction_origin_values": {"jurisdiction": _str, "origin": _str},
+    "jurisdictional_origin": {
+        "jurisdictionValue": _str,
+        "origin": _str,
+        "updateDate": _str,
+    },
+    "rank_name": {
+        "kingdomId": _int,
+        "kingdomName": _str,
+        "rankId": _int,
+        "rankName": _str,
+        "tsn": _int,
+    },
+    "terms": {
+        "author": _str,
+        "commonNames": pl.List(_str),
+        "nameUsage": _str,
+        "scientificName": _str,
+        "tsn": _int,
+    },
+}
+
+
+def _frame(rows, schema=None, **columns):
+    """
+    Build a polars data frame column by column
+
+    :param rows: list of dicts (or one dict); None entries are skipped
+    :param schema: (str) name of the ITIS function whose declared column
+        types in `_schemas` to use
+    :param **columns: leading columns given as lists, one value per row
+    """
+    if isinstance(rows, dict):
+        rows = [rows]
+    rows = [w for w in rows if w is not None]
+    types = {k: None for k in columns}
+    types.update(_schemas.get(schema, {}))
+    for row in rows:
+        for key in row:
+            if key not in types:
+                types[key] = None
+    data = {}
+    for key, dtype in types.items():
+        values = columns[key] if key in columns else [w.get(key) for w in rows]
+        data[key] = pl.Series(key, values, dtype=dtype, strict=False)
+    return pl.DataFrame(data, height=len(rows))
+
+
+def _df(x, as_dataframe=False, schema=None):
+    if as_dataframe:
+        return _frame(x, schema)
+    return x
 
 
 if __name__ == "__main__":
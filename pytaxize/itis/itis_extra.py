@@ -1,68 +1,128 @@
-# def itis_downstream(tsn, downto):
-#     '''
-#     Retrieve all taxa names or TSNs downstream in hierarchy from given TSN.
-
-#     :param tsn: A taxonomic serial number.
-#     :param downto: The taxonomic level you want to go down to. See examples below.
-#          The taxonomic level IS case sensitive, and you do have to spell it
-#          correctly. See \code{data(rank_ref)} for spelling.
-#     :param verbose: logical; If TRUE (default), informative messages printed.
-
-#     Usage:
-#     pytaxize.itis_downstream(tsn=846509, downto="Genus")
-
-#     # getting families downstream from Acridoidea
-#     pytaxize.itis_downstream(tsn=650497, "Family")
-
-#     # getting species downstream from Ursus
-#     pytaxize.itis_downstream(tsn=180541, downto="Species")
-#     '''
-#     dat = pl.read_csv("rank_ref.csv", header=False)
-#     downto2 = dat[dat['ranks'].str.contains(downto)]['rankId']
-#     torank_ids = dat[dat[dat['ranks'].str.contains(downto)].index : dat.shape[0]]['rankId']
-
-#     # stuff = [x for x in dat.ranks]
-#     # things = []
-#     # for i in range(len(stuff)):
-#     #     ss = downto in stuff[i]
-#     #     things.append(ss)
-#     # dat2 = dat.join(pl.DataFrame(things, columns=['match']))
-#     # subset = dat2[dat2.loc[dat2.match == True].index[0]: dat2.shape[0]]
-#     # torank = [x.split(',')[0] for x in subset.ranks]
-
-#     tsn2 = convertsingle(tsn)
-
-#     stop_ = "not"
-#     notout = pl.DataFrame(columns=['rankName'])
-#     out = []
-#     while(stop_ == "not"):
-#         temp = []
-#         if(len([x for x in notout.rankName]) == 0):
-#             temp = pytaxize.gettaxonomicranknamefromtsn(tsn2)
-#         else:
-#             temp = notout
-#         tt = pytaxize.gethierarchydownfromtsn(temp['tsn'])
-
-#         names = []
-#         for i in range(len(tt['tsn'])):
-#             d = pytaxize.gettaxonomicranknamefromtsn(tt['tsn'][i])
-#             names.append(d)
-#         names2 = pl.DataFrame(names)
-#         tt = tt.merge(names2, on='tsn')
-#         if(tt[tt['rankId'].str.contains(downto2.to_string().split(' ')[-1])].shape[0] > 0):
-#             out.append(tt[tt['rankId'].str.contains(downto2.to_string().split(' ')[-1])])
-
-#         if(tt.drop(matched.index).shape[0] > 0):
-#             shit = list(set([str(x) for x in torank_ids.tolist()]) - set(tt['rankId'].tolist()))
-#             notout = pl.DataFrame([tt[tt['rankId'].str.contains(x)] for x in shit])
-#         else:
-#             notout = pl.DataFrame([downto], columns=['rankName'])
-
-#         if(all(notout['rankName'] == downto)):
-#             stop_ = "fam"
-#         else:
-#             tsns = notout$tsn
-#             stop_ = "not"
-#     tmp = ldply(out)
-#     names(tmp) = tolower(names(tmp))
-#     tmp
+import csv
+import warnings
+from importlib.resources import as_file, files
+
+from pytaxize.itis import itis
+from pytaxize.utils import run_concurrent
+
+
+def batch(func, tsns, workers=16, as_dataframe=False, **kwargs):
+    """
+    Run a per-TSN ITIS function over many TSNs concurrently
+
+    :param func: an ITIS function taking a TSN, e.g. `itis.common_names`, or
+        its name as a string
+    :param tsns: list of TSNs
+    :param workers: (int) maximum number of requests in flight
+    :param as_dataframe: (bool) combine all results into one polars data
+        frame, with an ``input_tsn`` column giving the TSN each row came from
+    :param **kwargs: further arguments passed on to `func`
+
+    :return: tuple ``(results, errors)``. `results` is a list in the order of
+        `tsns`, with None for TSNs whose request failed (or a data frame, see
+        `as_dataframe`), and `errors` is a dict of the exceptions raised,
+        keyed by TSN
+
+    Usage::
+
+        from pytaxize import itis
+        res, errors = itis.batch(itis.common_names, [180543, 183833, 726872])
+        res, errors = itis.batch("rank_name", [202385, 180543], workers=4)
+        # one data frame for all TSNs
+        df, errors = itis.batch(itis.hierarchy_up, [36485, 37906], as_dataframe=True)
+    """
+    if isinstance(func, str):
+        func = getattr(itis, func)
+    out = run_concurrent(lambda tsn: func(tsn, **kwargs), tsns, workers)
+    results = []
+    errors = {}
+    for tsn, (res, err) in zip(tsns, out):
+        if err is not None:
+            warnings.warn(f"ITIS request failed for taxon '{tsn}': {err}")
+            errors[tsn] = err
+        results.append(res)
+    if as_dataframe:
+        results = _batch_df(tsns, results, getattr(func, "__name__", None))
+    return results, errors
+
+
+def _batch_df(tsns, results, schema=None):
+    rows = []
+    input_tsn = []
+    for tsn, res in zip(tsns, results):
+        if isinstance(res, dict):
+            res = [res] if res else []
+        for row in res or []:
+            if row is not None:
+                rows.append(row)
+                input_tsn.append(tsn)
+    return itis._frame(rows, schema, input_tsn=input_tsn)
+
+
+def downstream(tsn, downto, workers=8, as_dataframe=False, **kwargs):
+    """
+    Retrieve all taxa downstream in the hierarchy from a TSN, to a given rank
+
+    Walks `itis.hierarchy_down` level by level, fetching all taxa of a
+    level concurrently. Ranks come from the ``rankName`` of each child, and
+    branches whose rank is already below `downto` are not expanded.
+
+    :param tsn: (int) TSN for a taxonomic group
+    :param downto: (str) the taxonomic rank to go down to, e.g. "Genus" or
+        "Species"; see ``data/rank_ref.csv`` for the rank names
+    :param workers: (int) maximum number of requests in flight
+    :param as_dataframe: (bool) specify return type, if pandas is available
+    :param **kwargs: Curl options passed on to `requests.get`
+
+    :return: list of dicts, one per taxon at rank `downto`, with the same
+        fields as `itis.hierarchy_down`
+
+    Usage::
+
+        from pytaxize import itis
+        itis.downstream(tsn=846509, downto="Genus")
+        # getting families downstream from Acridoidea
+        itis.downstream(tsn=650497, downto="Family")
+        # getting species downstream from Ursus
+        itis.downstream(tsn=180541, downto="Species")
+    """
+    ranks = _rank_ids()
+    target = ranks.get(downto.lower())
+    if target is None:
+        raise ValueError(f"'{downto}' is not a rank name listed in rank_ref.csv")
+
+    out = []
+    seen = {str(tsn)}
+    frontier = [tsn]
+    while len(frontier) > 0:
+        res = run_concurrent(
+            lambda x: itis.hierarchy_down(x, **kwargs), frontier, workers
+        )
+        nxt = []
+        for parent, (children, err) in zip(frontier, res):
+            if err is not None:
+                warnings.warn(f"ITIS request failed for taxon '{parent}': {err}")
+                continue
+            for child in children:
+                if child is None or child["tsn"] in seen:
+                    continue
+                seen.add(child["tsn"])
+                rank = ranks.get(child["rankName"].strip().lower())
+                if rank == target:
+                    out.append(child)
+                elif rank is None or rank < target:
+                    nxt.append(child["tsn"])
+        frontier = nxt
+    return itis._df(out, as_dataframe, "hierarchy_down")
+
+
+def _rank_ids():
+    # rank name (lower case) -> ITIS rank id, from data/rank_ref.csv
+    with as_file(files("pytaxize").joinpath("data/rank_ref.csv")) as path:
+        with open(path, newline="") as f:
+            reader = csv.DictReader(f)
+            out = {}
+            for row in reader:
+                for rank in row["ranks"].split(","):
+                    out.setdefault(rank.strip().lower(), int(row["rankId"]))
+    return out
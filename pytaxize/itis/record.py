@@ -0,0 +1,92 @@
+import copy
+
+from pytaxize.itis import itis
+
+
+class TaxonRecord:
+    """
+    TaxonRecord: ITIS data for one TSN from a single full record request
+
+    The full record (`itis.full_record`) is fetched the first time any
+    accessor is used, and every accessor is derived from it, returning the
+    same shape as the ITIS function of the same name.
+
+    Usage::
+
+        from pytaxize import itis
+
+        x = itis.TaxonRecord(180543)
+        x
+        x.common_names()
+        x.hierarchy_up()
+        x.experts()
+        x.jurisdictional_origin()
+        x.credibility_rating()
+        # the record is only fetched once
+        x.record.keys()
+    """
+
+    def __init__(self, tsn):
+        self.tsn = tsn
+        self._record = None
+
+    def __repr__(self):
+        x = f"<{type(self).__name__}>\n"
+        y = f"  tsn: {self.tsn}\n  fetched: {self._record is not None}"
+        return x + y
+
+    @property
+    def record(self):
+        """The raw full record, fetched on first use"""
+        if self._record is None:
+            self._record = itis.full_record(tsn=self.tsn)
+        return self._record
+
+    def _part(self, key):
+        # parsers pop keys off their input, so hand them a copy
+        return copy.deepcopy(self.record[key])
+
+    def accepted_names(self):
+        return itis._accepted_names(self._part("acceptedNameList"))
+
+    def comment_detail(self, as_dataframe=False):
+        return itis._comment_detail(self._part("commentList"), as_dataframe)
+
+    def common_names(self, as_dataframe=False):
+        return itis._common_names(self._part("commonNameList"), as_dataframe)
+
+    def core_metadata(self, as_dataframe=False):
+        return itis._core_metadata(self._part("coreMetadata"), as_dataframe)
+
+    def credibility_rating(self, as_dataframe=False):
+        return itis._credibility_rating(self._part("credibilityRating"), as_dataframe)
+
+    def currency(self, as_dataframe=False):
+        return itis._currency(self._part("currencyRating"), as_dataframe)
+
+    def date_data(self, as_dataframe=False):
+        return itis._date_data(self._part("dateData"), as_dataframe)
+
+    def experts(self, as_dataframe=False):
+        return itis._experts(self._part("expertList"), as_dataframe)
+
+    def geographic_divisions(self, as_dataframe=False):
+        return itis._geographic_divisions(
+            self._part("geographicDivisionList"), as_dataframe
+        )
+
+    def global_species_completeness(self, as_dataframe=False):
+        return itis._global_species_completeness(
+            self._part("completenessRating"), as_dataframe
+        )
+
+    def hierarchy_up(self, as_dataframe=False):
+        return itis._hierarchy_up(self._part("hierarchyUp"), as_dataframe)
+
+    def jurisdictional_origin(self, as_dataframe=False):
+        return itis._jurisdictional_origin(
+            self._part("jurisdictionalOriginList"), as_dataframe
+        )
+
+    def rank_name(self, as_dataframe=False):
+        return itis._rank_name(self._part("taxRank"), as_dataframe)
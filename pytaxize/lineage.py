@@ -0,0 +1,183 @@
+import contextvars
+import threading
+import weakref
+from collections import OrderedDict
+from collections.abc import Mapping
+from contextlib import contextmanager
+
+
+class LineageNode(Mapping):
+    """
+    LineageNode: a read-only taxon of a lineage
+
+    Behaves like the dict it was made from (``node["Rank"]``, ``node.get``,
+    ``dict(node)``, ``node == {...}``), but takes a fraction of the memory,
+    and equal taxa are interned: `LineageNode.of` returns the same object
+    for every occurrence of a taxon, so ancestors shared by many lineages
+    are held once.
+
+    Usage::
+
+        from pytaxize.lineage import LineageNode
+        a = LineageNode.of({"ScientificName": "Eukaryota", "TaxId": "2759"})
+        b = LineageNode.of({"ScientificName": "Eukaryota", "TaxId": "2759"})
+        a is b
+        a["ScientificName"]
+        dict(a)
+    """
+
+    __slots__ = ("_keys", "_values", "__weakref__")
+    _interned = weakref.WeakValueDictionary()
+    _key_sets = {}
+    _lock = threading.Lock()
+
+    def __init__(self, keys, values):
+        self._keys = keys
+        self._values = values
+
+    @classmethod
+    def of(cls, record):
+        """The interned node for a dict (or node)"""
+        if isinstance(record, cls):
+            return record
+        keys = tuple(record)
+        values = tuple(record.values())
+        with cls._lock:
+            keys = cls._key_sets.setdefault(keys, keys)
+            try:
+                node = cls._interned.get((keys, values))
+            except TypeError:
+                # unhashable values, e.g. lists, cannot be interned
+                return cls(keys, values)
+            if node is None:
+                node = cls(keys, values)
+                cls._interned[(keys, values)] = node
+        return node
+
+    def __getitem__(self, key):
+        try:
+            return self._values[self._keys.index(key)]
+        except ValueError:
+            raise KeyError(key) from None
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return repr(dict(zip(self._keys, self._values)))
+
+    def __reduce__(self):
+        return (LineageNode.of, (dict(self),))
+
+
+class AncestorStore:
+    """
+    Thread-safe in-memory store of taxa and their parents
+
+    Filled from hierarchy responses received inside `recording`, so that the
+    lineage of a taxon can be assembled from taxa seen in earlier responses
+    (e.g. siblings sharing the same genus) instead of being fetched again.
+    Past `maxsize` taxa, the least recently used are dropped.
+
+    :param maxsize: (int) maximum number of taxa kept
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._nodes = OrderedDict()
+        self._lock = threading.Lock()
+        self._recording = contextvars.ContextVar("recording", default=False)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, id):
+        return str(id) in self._nodes
+
+    @property
+    def recording(self):
+        """True inside `record`, when hierarchy responses are to be added"""
+        return self._recording.get()
+
+    @contextmanager
+    def record(self):
+        """
+        Add the taxa of hierarchy responses received in this block (in this
+        thread or task) to the store
+        """
+        token = self._recording.set(True)
+        try:
+            yield self
+        finally:
+            self._recording.reset(token)
+
+    def add(self, id, parent, record):
+        """
+        Add a taxon
+
+        :param id: taxon id
+        :param parent: id of the parent taxon, None (or "", "0") for a root
+        :param record: (dict) the taxon as returned to users
+        """
+        if parent in ("", "0", 0):
+            parent = None
+        with self._lock:
+            self._nodes[str(id)] = (
+                None if parent is None else str(parent),
+                LineageNode.of(record),
+            )
+            self._nodes.move_to_end(str(id))
+            while len(self._nodes) > self.maxsize:
+                self._nodes.popitem(last=False)
+
+    def add_path(self, records, key):
+        """
+        Add a lineage, given root first, each taxon being the parent of the next
+
+        :param records: list of dicts
+        :param key: (str) the key of the taxon id in `records`
+        """
+        parent = None
+        for record in records:
+            self.add(record[key], parent, record)
+            parent = record[key]
+
+    def parent(self, id):
+        """Id of the parent of a known taxon, or None"""
+        node = self._nodes.get(str(id))
+        return None if node is None else node[0]
+
+    def lineage(self, id, compact=False):
+        """
+        Lineage of a taxon, root first and ending with the taxon itself
+
+        :param compact: (bool) give interned `LineageNode` objects instead of
+            dicts
+        :return: list of copies of the stored records, or None if the taxon or
+            any of its ancestors is not known
+        """
+        out = []
+        id = str(id)
+        with self._lock:
+            while id is not None:
+                node = self._nodes.get(id)
+                if node is None or len(out) > len(self._nodes):
+                    return None
+                self._nodes.move_to_end(id)
+                out.append(node[1] if compact else dict(node[1]))
+                id = node[0]
+        return out[::-1]
+
+    def clear(self):
+        with self._lock:
+            self._nodes.clear()
+
+
+# ancestors seen in ITIS hierarchy responses, keyed by TSN
+itis_ancestors = AncestorStore()
+
+# ancestors seen in NCBI lineages, keyed by taxonomy id
+ncbi_ancestors = AncestorStore()
@@ -1,6 +1,10 @@
-from .ncbi import hierarchy, search
+from .ncbi import hierarchy, iter_hierarchy, search, set_backend
+from .taxdump import Taxdump
 
 __all__ = [
+    "Taxdump",
     "hierarchy",
+    "iter_hierarchy",
     "search",
+    "set_backend",
 ]
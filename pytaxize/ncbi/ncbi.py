@@ -1,11 +1,46 @@
 import os
 import re
+from urllib.parse import urlencode
 
+from pytaxize.lineage import LineageNode, ncbi_ancestors
 from pytaxize.refactor import Refactor
-from pytaxize.utils import lists2dict, str2list
+from pytaxize.utils import (
+    dedupe_names,
+    fan_out,
+    lists2dict,
+    normalize_name,
+    str2list,
+)
 
+# local data source answering hierarchy and search requests, see set_backend
+_backend = None
 
-def search(sci_com, modifier=None, rank_query=None):
+
+def set_backend(backend=None):
+    """
+    Answer NCBI requests from a local data source instead of Entrez
+
+    :param backend: e.g. `ncbi.Taxdump`, an object with a ``lineage(taxid)``
+        method returning lineages as `ncbi.hierarchy` does, a ``search(name,
+        rank=None)`` method returning taxids, and a ``taxon(taxid)`` method
+        returning a dict with ``ScientificName``, ``Rank`` and ``TaxId``;
+        None goes back to Entrez
+
+    :note: `ncbi.search` with a `modifier` always uses Entrez
+
+    Usage::
+
+        from pytaxize import ncbi
+        ncbi.set_backend(ncbi.Taxdump("taxdump"))
+        ncbi.hierarchy(ids=9606)
+        ncbi.set_backend(None)
+    """
+    global _backend
+    _backend = backend
+    ncbi_ancestors.clear()
+
+
+def search(sci_com, modifier=None, rank_query=None, bulk=False, chunk_size=100):
     """
     Search NCBI's taxonomic data - get NCBI taxonomic IDs
 
@@ -18,6 +53,15 @@ def search(sci_com, modifier=None, rank_query=None):
     :param rank_query: A taxonomic rank name to modify the query sent to NCBI.
         Though note that some data sources use atypical ranks, so inspect the
         data itself for options. Optional.
+    :param bulk: (bool) search many names per request: names are combined
+        into OR queries of `chunk_size` names, the summaries of all ids found
+        are fetched in large batches, and summaries are matched back to names
+        on their ``ScientificName``. Names that match nothing that way (e.g.
+        common names or synonyms) are then searched one by one.
+    :param chunk_size: (int) number of names per query when `bulk` is True
+
+    Names repeated in `sci_com` (ignoring case and whitespace) are searched
+    once.
 
     :note: Remember to set your Entrez API key as `ENTREZ_KEY`
 
@@ -40,8 +84,20 @@ def search(sci_com, modifier=None, rank_query=None):
 
         # common names
         ncbi.search(sci_com = 'bear')
+
+        # many names in few requests
+        ncbi.search(sci_com=["Apis", "Puma concolor", "Pinus"], bulk=True)
     """
 
+    if _backend is not None and modifier is None:
+        sci_com = str2list(sci_com)
+        names, index = dedupe_names(sci_com)
+        temp = [
+            [_backend.taxon(w) for w in _backend.search(name, rank=rank_query)]
+            for name in names
+        ]
+        return lists2dict(fan_out(temp, index), sci_com)
+
     key = os.environ.get("ENTREZ_KEY")
     if key is None:
         raise Exception("ENTREZ_KEY is not defined")
@@ -61,27 +117,65 @@ def search(sci_com, modifier=None, rank_query=None):
             ids = ",".join(map(str, ids))
         args = {"db": "taxonomy", "ID": ids, "api_key": key}
         res = _entrez("esummary", args)
-        # docsums = res.xpath("//DocSum")[0].getchildren()
-        docsums = res.xpath("//DocSum")
-        out = []
-        for x in range(len(docsums)):
-            keys = [w.values()[0] for w in docsums[x][1:]]
-            vals = [w.text for w in docsums[x][1:]]
-            out.append(dict(zip(keys, vals)))
-        return out
+        return _docsums(res)
 
     sci_com = str2list(sci_com)
+    # search each distinct name once
+    names, index = dedupe_names(sci_com)
+    found = {}
+    if bulk:
+        found = _search_bulk(names, modifier, rank_query, key, chunk_size)
     temp = []
-    for i in range(len(sci_com)):
-        temp.append(func(sci_com[i]))
-    return lists2dict(temp, sci_com)
+    for i in range(len(names)):
+        res = found.get(normalize_name(names[i]))
+        temp.append(res if res is not None else func(names[i]))
+    return lists2dict(fan_out(temp, index), sci_com)
 
 
-def hierarchy(ids):
+def _docsums(res):
+    docsums = res.xpath("//DocSum")
+    out = []
+    for x in range(len(docsums)):
+        keys = [w.values()[0] for w in docsums[x][1:]]
+        vals = [w.text for w in docsums[x][1:]]
+        out.append(dict(zip(keys, vals)))
+    return out
+
+
+def _search_bulk(names, modifier, rank_query, key, chunk_size=100, ids_size=500):
+    # summaries of the taxa matching many names, keyed by lower case
+    # ScientificName; esearch ORs `chunk_size` names at a time and esummary
+    # takes up to `ids_size` ids per request
+    field = modifier or "All Names"
+    names = [normalize_name(w) for w in names]
+    ids = []
+    for i in range(0, len(names), chunk_size):
+        term = " OR ".join(f'"{w}"[{field}]' for w in names[i : i + chunk_size])
+        term = f"({term})"
+        if rank_query is not None:
+            term = term + f" AND {rank_query}[Rank]"
+        args = {"db": "taxonomy", "term": term, "retmax": 100000, "api_key": key}
+        tt = _entrez("esearch", args)
+        ids.extend(z.text for z in tt.xpath("//IdList/Id"))
+    ids = list(dict.fromkeys(ids))
+    found = {}
+    for i in range(0, len(ids), ids_size):
+        args = {"db": "taxonomy", "ID": ",".join(ids[i : i + ids_size]), "api_key": key}
+        for doc in _docsums(_entrez("esummary", args)):
+            name = normalize_name(doc.get("ScientificName") or "")
+            found.setdefault(name, []).append(doc)
+    return found
+
+
+def hierarchy(ids, compact=False):
     """
     Get a full taxonomic hierarchy from NCBI
 
     :param ids: one or more NCBI taxonomy ids
+    :param compact: (bool) give each taxon as a read-only
+        `pytaxize.lineage.LineageNode` instead of a dict; the same node object
+        is shared by all lineages containing the taxon, which saves a lot of
+        memory on large jobs
 
     :note: Remember to set your Entrez API key as `ENTREZ_KEY`
 
@@ -94,30 +188,158 @@ def hierarchy(ids):
         from pytaxize import ncbi
         ncbi.hierarchy(ids=9606)
         ncbi.hierarchy(ids=[9606,55062,4231])
+        ncbi.hierarchy(ids=[9606,55062,4231], compact=True)
+    """
+    return dict(iter_hierarchy(ids, compact))
+
+
+def iter_hierarchy(ids, compact=False):
     """
-    toget = ["ScientificName", "Rank", "TaxId"]
+    Stream full taxonomic hierarchies from NCBI, one taxon at a time
+
+    The efetch response is parsed incrementally and each taxon is discarded
+    once its lineage has been yielded, so memory use does not grow with the
+    number of ids requested.
+
+    :param ids: one or more NCBI taxonomy ids
+    :param compact: (bool) give taxa as shared read-only
+        `pytaxize.lineage.LineageNode` objects instead of dicts, see
+        `hierarchy`
+
+    :note: Remember to set your Entrez API key as `ENTREZ_KEY`
+
+    :return: generator of ``(id, lineage)`` tuples, one per distinct id in
+        the order of `ids`, where each lineage is a list of dicts with the
+        fields ``ScientificName``, ``Rank``, and ``TaxId``, as in
+        `hierarchy`; taxa are matched to ids on their TaxId (or the ids
+        merged into it), and ids NCBI does not know get an empty list
+
+    Usage::
+
+        from pytaxize import ncbi
+        for id, lineage in ncbi.iter_hierarchy(ids=[9606,55062,4231]):
+            print(id, lineage[-1])
+    """
+    if not isinstance(ids, list):
+        ids = [ids]
+    if _backend is not None:
+        for id in ids:
+            yield _yield_lineage(id, _backend.lineage(id), compact)
+        return
     key = os.environ.get("ENTREZ_KEY")
     if key is None:
         raise Exception("ENTREZ_KEY is not defined")
-    if not isinstance(ids, list):
-        ids = [ids]
-    idz = ",".join([str(x) for x in ids])
-    args = {"db": "taxonomy", "ID": idz, "api_key": key}
-    res = _entrez("efetch", args)
-    taxa = res.xpath("//TaxaSet/Taxon")
-    out = []
-    for x in range(len(taxa)):
-        nodes = taxa[x].xpath(".//LineageEx/Taxon")
-        tmp = [
-            dict(zip(toget, [node.xpath(w)[0].text for w in toget])) for node in nodes
-        ]
-        tmp.append(dict(zip(toget, [taxa[x].xpath(w)[0].text for w in toget])))
-        out.append(tmp)
-    return dict(zip(ids, out))
+    given = {}
+    for id in ids:
+        given.setdefault(str(id), id)
+    # match taxa to ids on their TaxId, yielding in the order of the ids;
+    # taxa arriving ahead of their turn wait in `found`, also across pages,
+    # as ids the History server drops shift later ids to earlier pages
+    found = {}
+    for page, taxa in _efetch_pages(ids, key):
+        i = 0
+        for taxon in taxa:
+            lineage = _lineage(taxon)
+            for taxid in _taxids(taxon):
+                if taxid in given:
+                    found[taxid] = lineage
+            while i < len(page) and page[i] in found:
+                yield _yield_lineage(given[page[i]], found.pop(page[i]), compact)
+                i += 1
+        for taxid in page[i:]:
+            yield _yield_lineage(given[taxid], found.pop(taxid, []), compact)
+
+
+def _yield_lineage(id, lineage, compact):
+    if ncbi_ancestors.recording:
+        ncbi_ancestors.add_path(lineage, "TaxId")
+    return id, _compact(lineage) if compact else lineage
+
+
+def _compact(lineage):
+    return [LineageNode.of(w) for w in lineage]
+
+
+_lineage_fields = ["ScientificName", "Rank", "TaxId"]
+
+
+def _lineage(taxon):
+    nodes = taxon.findall("LineageEx/Taxon")
+    out = [{w: node.findtext(w) for w in _lineage_fields} for node in nodes]
+    out.append({w: taxon.findtext(w) for w in _lineage_fields})
+    return out
+
+
+# longest id list sent in an efetch query string; longer lists are posted to
+# the Entrez History server and fetched from it in pages
+_max_get_ids = 200
+
+# longest query string sent with GET; longer queries are sent with POST
+_max_query_length = 2000
+
+
+def _efetch_taxa(ids, key, page_size=10000, **kwargs):
+    # yield top level TaxaSet/Taxon elements as they are parsed, then free them
+    for _, taxa in _efetch_pages(ids, key, page_size, **kwargs):
+        yield from taxa
+
+
+def _efetch_pages(ids, key, page_size=10000, **kwargs):
+    # yield (page, taxa) per efetch request: the distinct ids asked for, and
+    # a generator of the taxa returned for them, which may be fewer (unknown
+    # ids) and carry a new TaxId (merged ids, see `_taxids`)
+    ids = list(dict.fromkeys(str(x) for x in ids))
+    if len(ids) <= _max_get_ids:
+        pages = [(ids, {"db": "taxonomy", "ID": ",".join(ids), "api_key": key})]
+    else:
+        pages = _history_pages(ids, key, page_size)
+    for page, args in pages:
+        yield page, _iter_taxa(args, **kwargs)
+
+
+def _iter_taxa(args, **kwargs):
+    url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
+    taxa = Refactor(url, args, request="get").iterxml(tag="Taxon", **kwargs)
+    for taxon in taxa:
+        parent = taxon.getparent()
+        if parent is None or parent.tag != "TaxaSet":
+            continue
+        yield taxon
+        taxon.clear()
+        while taxon.getprevious() is not None:
+            del parent[0]
+
+
+def _taxids(taxon):
+    # the TaxId of a taxon, and the ids merged into it
+    return [taxon.findtext("TaxId")] + [
+        w.text for w in taxon.findall("AkaTaxIds/TaxId")
+    ]
+
+
+def _history_pages(ids, key, page_size=10000):
+    # post all ids to the Entrez History server once, then yield the ids and
+    # efetch arguments of pages of `page_size` records
+    args = {"db": "taxonomy", "id": ",".join(ids), "api_key": key}
+    res = _entrez("epost", args)
+    for start in range(0, len(ids), page_size):
+        yield (
+            ids[start : start + page_size],
+            {
+                "db": "taxonomy",
+                "query_key": res.findtext("QueryKey"),
+                "WebEnv": res.findtext("WebEnv"),
+                "retstart": start,
+                "retmax": page_size,
+                "api_key": key,
+            },
+        )
 
 
 def _entrez(path="esearch", args={}):
     url = f"https://eutils.ncbi.nlm.nih.gov/entrez/eutils/{path}.fcgi"
+    if len(urlencode(args, doseq=True)) > _max_query_length:
+        return Refactor(url, {}, request="post").xml(data=args)
     tt = Refactor(url, args, request="get").xml()
     return tt
 
@@ -0,0 +1,263 @@
+import array
+import bisect
+import json
+import mmap
+import os
+import sys
+
+_magic = b"PYTAXDMP"
+_version = 1
+
+
+def _rows(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            yield line.rstrip("\n").rstrip("\t|").split("\t|\t")
+
+
+def _build(nodes, names, index):
+    ranks = []
+    rank_codes = {}
+    parent = array.array("I")
+    rank = array.array("B")
+    for row in _rows(nodes):
+        taxid, up, name = int(row[0]), int(row[1]), row[2]
+        if taxid >= len(parent):
+            grow = taxid + 1 - len(parent)
+            parent.extend([0] * grow)
+            rank.extend([0] * grow)
+        if name not in rank_codes:
+            rank_codes[name] = len(ranks)
+            ranks.append(name)
+        parent[taxid] = up
+        rank[taxid] = rank_codes[name]
+
+    size = len(parent)
+    name_off = array.array("I", [0]) * size
+    name_len = array.array("H", [0]) * size
+    blob = bytearray()
+    pairs = []
+    for row in _rows(names):
+        taxid, text, kind = int(row[0]), row[1], row[3]
+        if taxid >= size:
+            continue
+        if kind == "scientific name":
+            data = text.encode("utf-8")
+            name_off[taxid] = len(blob)
+            name_len[taxid] = len(data)
+            blob += data
+        pairs.append((text.lower().encode("utf-8"), taxid))
+
+    # all names (scientific, synonyms, common names, ...) sorted for
+    # binary search
+    pairs.sort()
+    search_blob = bytearray()
+    search_off = array.array("I")
+    search_tax = array.array("I")
+    for text, taxid in pairs:
+        search_off.append(len(search_blob))
+        search_blob += text
+        search_tax.append(taxid)
+    search_off.append(len(search_blob))
+
+    sections = {
+        "parent": parent,
+        "rank": rank,
+        "name_off": name_off,
+        "name_len": name_len,
+        "names": blob,
+        "search_off": search_off,
+        "search_tax": search_tax,
+        "search_names": search_blob,
+    }
+    layout = {}
+    offset = 0
+    for key, value in sections.items():
+        length = len(memoryview(value).cast("B"))
+        layout[key] = [offset, length]
+        offset += length + (-length % 8)
+    header = json.dumps(
+        {
+            "version": _version,
+            "byteorder": sys.byteorder,
+            "taxa": sum(1 for w in name_len if w),
+            "ranks": ranks,
+            "layout": layout,
+        }
+    ).encode()
+    header += b" " * (-(len(header) + 16) % 8)
+    tmp = index + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_magic + len(header).to_bytes(8, "little") + header)
+        for key, value in sections.items():
+            data = memoryview(value).cast("B")
+            f.write(data)
+            f.write(b"\0" * (-len(data) % 8))
+    os.replace(tmp, index)
+
+
+class _SearchNames:
+    # sequence view of the sorted search names, for bisect
+    def __init__(self, off, names):
+        self.off = off
+        self.names = names
+
+    def __len__(self):
+        return len(self.off) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.names[self.off[i] : self.off[i + 1]])
+
+
+class Taxdump:
+    """
+    Taxdump: NCBI taxonomy from a local copy of the taxdump files
+
+    NCBI publishes its taxonomy as the ``nodes.dmp`` and ``names.dmp`` files
+    in https://ftp.ncbi.nlm.nih.gov/pub/taxonomy/taxdump.tar.gz. The first
+    time they are used, they are converted into a compact index file of
+    arrays (parent taxid, rank code and scientific name by taxid, plus a
+    sorted index of all names) that is memory-mapped, so later runs start
+    without parsing anything. The index is rebuilt when the dump files are
+    newer than it.
+
+    Register a Taxdump with `ncbi.set_backend` and `ncbi.hierarchy` and
+    `ncbi.search` (exact names, without `modifier`) are answered from it.
+
+    :param path: directory holding ``nodes.dmp`` and ``names.dmp``
+    :param index: path of the index file, default ``pytaxize_taxdump.idx``
+        in `path`
+
+    Usage::
+
+        from pytaxize import ncbi
+        dump = ncbi.Taxdump("taxdump")
+        dump.lineage(9606)
+        dump.search("Homo sapiens")
+        ncbi.set_backend(dump)
+        ncbi.hierarchy(ids=[9606, 55062])
+        ncbi.search(sci_com=["Apis", "Puma concolor"])
+        # back to Entrez
+        ncbi.set_backend(None)
+    """
+
+    def __init__(self, path, index=None):
+        self.path = path
+        self.index = index or os.path.join(path, "pytaxize_taxdump.idx")
+        nodes = os.path.join(path, "nodes.dmp")
+        names = os.path.join(path, "names.dmp")
+        if not self._fresh(nodes, names):
+            _build(nodes, names, self.index)
+        self._open()
+
+    def __repr__(self):
+        return f"<{type(self).__name__}>\n  path: {self.path}\n  taxa: {len(self)}"
+
+    def __len__(self):
+        return self._taxa
+
+    def _fresh(self, *sources):
+        try:
+            built = os.path.getmtime(self.index)
+            with open(self.index, "rb") as f:
+                head = f.read(16)
+                header = json.loads(f.read(int.from_bytes(head[8:], "little")))
+        except (OSError, ValueError):
+            return False
+        return (
+            head[:8] == _magic
+            and header["version"] == _version
+            and header["byteorder"] == sys.byteorder
+            and all(os.path.getmtime(w) <= built for w in sources)
+        )
+
+    def _open(self):
+        with open(self.index, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        size = int.from_bytes(self._mmap[8:16], "little")
+        header = json.loads(self._mmap[16 : 16 + size])
+        self.ranks = header["ranks"]
+        self._taxa = header["taxa"]
+        base = 16 + size
+        view = memoryview(self._mmap)
+        formats = {
+            "parent": "I",
+            "rank": "B",
+            "name_off": "I",
+            "name_len": "H",
+            "search_off": "I",
+            "search_tax": "I",
+        }
+        for key, (offset, length) in header["layout"].items():
+            part = view[base + offset : base + offset + length]
+            setattr(self, "_" + key, part.cast(formats.get(key, "B")))
+        self._search = _SearchNames(self._search_off, self._search_names)
+
+    def close(self):
+        for key in list(vars(self)):
+            if isinstance(getattr(self, key), memoryview):
+                getattr(self, key).release()
+        self._search = None
+        self._mmap.close()
+
+    def _known(self, taxid):
+        return 0 <= taxid < len(self._parent) and self._name_len[taxid] > 0
+
+    def name(self, taxid):
+        """Scientific name of a taxid, or None if unknown"""
+        taxid = int(taxid)
+        if not self._known(taxid):
+            return None
+        start = self._name_off[taxid]
+        return str(self._names[start : start + self._name_len[taxid]], "utf-8")
+
+    def rank(self, taxid):
+        """Rank of a taxid, or None if unknown"""
+        taxid = int(taxid)
+        return self.ranks[self._rank[taxid]] if self._known(taxid) else None
+
+    def parent(self, taxid):
+        """Parent taxid of a taxid, or None for the root or if unknown"""
+        taxid = int(taxid)
+        if not self._known(taxid) or self._parent[taxid] == taxid:
+            return None
+        return self._parent[taxid]
+
+    def taxon(self, taxid):
+        """A taxid as a dict with ``ScientificName``, ``Rank`` and ``TaxId``"""
+        return {
+            "ScientificName": self.name(taxid),
+            "Rank": self.rank(taxid),
+            "TaxId": str(taxid),
+        }
+
+    def lineage(self, taxid):
+        """
+        Lineage of a taxid as `ncbi.hierarchy` gives it: from the first taxon
+        below the root down to the taxid itself, [] if the taxid is unknown
+        """
+        out = []
+        taxid = int(taxid)
+        while self._known(taxid) and self.parent(taxid) is not None:
+            out.append(self.taxon(taxid))
+            if len(out) > len(self._parent):
+                break
+            taxid = self._parent[taxid]
+        return out[::-1]
+
+    def search(self, name, rank=None):
+        """
+        Taxids with a name (of any class, e.g. synonyms and common names)
+        equal to `name`, ignoring case
+
+        :param rank: (str) only return taxids of this rank
+        """
+        key = name.lower().encode("utf-8")
+        i = bisect.bisect_left(self._search, key)
+        out = []
+        while i < len(self._search) and self._search[i] == key:
+            taxid = self._search_tax[i]
+            if taxid not in out and (rank is None or self.rank(taxid) == rank):
+                out.append(taxid)
+            i += 1
+        return out
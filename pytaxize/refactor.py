@@ -1,58 +1,543 @@
+import contextvars
+import os
+import random
+import threading
 import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
 
 import requests
 from lxml import etree
 
+from pytaxize.cache import ResponseCache
+
+
+class SessionPool:
+    """
+    Shared pool of keep-alive HTTP sessions
+
+    Every thread gets its own `requests.Session`, but all sessions mount the
+    same transport adapters, so TCP/TLS connections to a host are reused
+    across calls and across threads.
+
+    :param maxsize: (int) maximum number of connections kept alive per host
+    :param hosts: (dict) per-host overrides of `maxsize`, keyed by host name,
+        e.g. ``{"eutils.ncbi.nlm.nih.gov": 3}``
+    """
+
+    def __init__(self, maxsize=10, hosts=None):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._generation = 0
+        self._adapters = {}
+        self.configure(maxsize, hosts)
+
+    def configure(self, maxsize=10, hosts=None):
+        with self._lock:
+            self.close()
+            self.maxsize = maxsize
+            self.hosts = dict(hosts or {})
+            self._default = self._adapter(maxsize)
+            self._adapters = {h: self._adapter(n) for h, n in self.hosts.items()}
+            self._generation += 1
+
+    def _adapter(self, maxsize):
+        return requests.adapters.HTTPAdapter(pool_connections=32, pool_maxsize=maxsize)
+
+    def session(self):
+        """Return the calling thread's session, creating it on first use"""
+        sess = getattr(self._local, "session", None)
+        if sess is None or self._local.generation != self._generation:
+            with self._lock:
+                sess = requests.Session()
+                sess.mount("http://", self._default)
+                sess.mount("https://", self._default)
+                for host, adapter in self._adapters.items():
+                    sess.mount(f"http://{host}", adapter)
+                    sess.mount(f"https://{host}", adapter)
+                self._local.session = sess
+                self._local.generation = self._generation
+        return sess
+
+    def stats(self):
+        """
+        Connection reuse statistics for the hosts currently in the pool
+
+        :return: dict keyed by host, each value a dict with ``requests``
+            (requests sent), ``connections`` (connections opened) and
+            ``reused`` (requests served over an already open connection)
+        """
+        out = {}
+        for adapter in [self._default, *self._adapters.values()]:
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                host = pool.host
+                tmp = out.setdefault(host, {"requests": 0, "connections": 0})
+                tmp["requests"] += pool.num_requests
+                tmp["connections"] += pool.num_connections
+        for tmp in out.values():
+            tmp["reused"] = max(tmp["requests"] - tmp["connections"], 0)
+        return out
+
+    def close(self):
+        for adapter in [getattr(self, "_default", None), *self._adapters.values()]:
+            if adapter is not None:
+                adapter.close()
+
+
+_pool = SessionPool()
+
+
+def configure_pool(maxsize=10, hosts=None):
+    """
+    Configure the shared HTTP connection pool used by all pytaxize requests
+
+    :param maxsize: (int) maximum number of keep-alive connections per host
+    :param hosts: (dict) per-host connection limits, keyed by host name
+
+    Usage::
+
+        from pytaxize.refactor import configure_pool
+        configure_pool(maxsize=16, hosts={"eutils.ncbi.nlm.nih.gov": 3})
+    """
+    _pool.configure(maxsize, hosts)
+
+
+def pool_stats():
+    """
+    Get connection reuse statistics of the shared HTTP connection pool
+
+    Usage::
+
+        from pytaxize import itis
+        from pytaxize.refactor import pool_stats
+        itis.rank_name(202385)
+        itis.rank_name(180543)
+        pool_stats()
+    """
+    return _pool.stats()
+
+
+# host names each provider sends requests to
+provider_hosts = {
+    "ncbi": ("eutils.ncbi.nlm.nih.gov",),
+    "itis": ("www.itis.gov",),
+    "col": ("www.catalogueoflife.org",),
+    "gn": (
+        "resolver.globalnames.org",
+        "gni.globalnames.org",
+        "finder.globalnames.org",
+    ),
+    "vascan": ("data.canadensys.net",),
+}
+
+
+class RateLimiter:
+    """
+    Per-host token buckets shared by all threads
+
+    Each host has a bucket refilled at `rate` requests per second and
+    holding at most `burst` tokens; a request takes one token and waits
+    for the bucket to refill when it is empty. NCBI E-utilities are
+    limited to 3 requests per second by default, or 10 when the
+    ``ENTREZ_KEY`` environment variable is set.
+    """
+
+    def __init__(self):
+        self.limits = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def limit(self, host):
+        """Return ``(rate, burst)`` for a host, or None if it is not limited"""
+        if host in self.limits:
+            return self.limits[host]
+        if host == "eutils.ncbi.nlm.nih.gov":
+            rate = 10 if os.environ.get("ENTREZ_KEY") else 3
+            return rate, rate
+        return None
+
+    def acquire(self, host):
+        """Block until a request to `host` is allowed; return the time waited"""
+        waited = 0.0
+        while True:
+            lim = self.limit(host)
+            if lim is None:
+                return waited
+            rate, burst = lim
+            with self._lock:
+                now = time.monotonic()
+                tokens, last = self._buckets.get(host, (burst, now))
+                tokens = min(burst, tokens + (now - last) * rate)
+                if tokens >= 1:
+                    self._buckets[host] = (tokens - 1, now)
+                    return waited
+                self._buckets[host] = (tokens, now)
+                wait = (1 - tokens) / rate
+            time.sleep(wait)
+            waited += wait
+
+
+_limiter = RateLimiter()
+
+
+def set_rate_limit(provider, rate, burst=None):
+    """
+    Set the maximum request rate for a provider or host
+
+    :param provider: one of the `provider_hosts` keys (ncbi, itis, col, gn,
+        vascan), or a host name
+    :param rate: (float) requests per second, greater than 0; None removes
+        the limit, which for NCBI restores the ``ENTREZ_KEY`` aware default
+    :param burst: (int) maximum number of requests sent back to back,
+        default: `rate`
+
+    Usage::
+
+        from pytaxize.refactor import set_rate_limit
+        set_rate_limit("itis", 5)
+        set_rate_limit("ncbi", 8, burst=1)
+    """
+    if rate is not None and not rate > 0:
+        raise ValueError("'rate' must be greater than 0 or None")
+    hosts = provider_hosts.get(provider, (provider,))
+    for host in hosts:
+        if rate is None:
+            _limiter.limits.pop(host, None)
+        else:
+            _limiter.limits[host] = (rate, max(burst or rate, 1))
+
+
+class RetryPolicy:
+    """
+    Retry transient HTTP failures with jittered exponential backoff
+
+    A request is retried when the connection fails or the response status is
+    in `statuses`. The wait before retry ``n`` is drawn uniformly between 0
+    and ``min(max_backoff, backoff * 2 ** n)`` seconds, unless the response
+    carries a ``Retry-After`` header, which is honored instead. When
+    ``Retry-After`` asks for a longer wait than `max_backoff`, the call is
+    not retried and fails with that response.
+
+    :param retries: (int) maximum number of retries per call
+    :param backoff: (float) base backoff in seconds
+    :param max_backoff: (float) maximum wait between two attempts, in seconds
+    :param statuses: (tuple) HTTP status codes that are retried
+    """
+
+    def __init__(
+        self,
+        retries=3,
+        backoff=0.5,
+        max_backoff=30,
+        statuses=(429, 500, 502, 503, 504),
+    ):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = tuple(statuses)
+
+    def delay(self, attempt, response=None):
+        """
+        Seconds to wait before retry number `attempt`, or None if the response
+        asks for a longer wait than `max_backoff`
+        """
+        if response is not None and "Retry-After" in response.headers:
+            value = response.headers["Retry-After"]
+            try:
+                wait = float(value)
+            except ValueError:
+                try:
+                    wait = parsedate_to_datetime(value).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    wait = None
+            if wait is not None:
+                return max(wait, 0.0) if wait <= self.max_backoff else None
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+
+class _RetryStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.retries = 0
+        self.retry_time = 0.0
+        self.gave_up = 0
+        self.budget_exhausted = 0
+
+    def add(self, **kwargs):
+        with self._lock:
+            for key, value in kwargs.items():
+                setattr(self, key, getattr(self, key) + value)
+
+    def asdict(self):
+        return {
+            "retries": self.retries,
+            "retry_time": self.retry_time,
+            "gave_up": self.gave_up,
+            "budget_exhausted": self.budget_exhausted,
+        }
+
+
+class _RetryBudget:
+    def __init__(self, retries):
+        self.remaining = retries
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+_retry = RetryPolicy()
+_retry_stats = _RetryStats()
+_retry_budget = contextvars.ContextVar("retry_budget", default=None)
+
+
+def configure_retries(
+    retries=3, backoff=0.5, max_backoff=30, statuses=(429, 500, 502, 503, 504)
+):
+    """
+    Configure how pytaxize retries transient HTTP failures
+
+    See `RetryPolicy` for the parameters; ``retries=0`` turns retries off.
+
+    Usage::
+
+        from pytaxize.refactor import configure_retries
+        configure_retries(retries=5, backoff=1, max_backoff=60)
+    """
+    global _retry
+    _retry = RetryPolicy(retries, backoff, max_backoff, statuses)
+
+
+@contextmanager
+def retry_budget(retries):
+    """
+    Cap the total number of retries made by all calls inside a block
+
+    Once the budget is spent, failing calls raise at once instead of
+    retrying, so a long batch against a struggling service fails fast.
+
+    The budget belongs to the calling thread (or asyncio task), so batches
+    running side by side each have their own. Calls that pytaxize spreads
+    over threads, e.g. `itis.batch` or the `pytaxize.aio` functions, draw on
+    the budget of the block they were started in.
+
+    :param retries: (int) total number of retries allowed in the block
+
+    Usage::
+
+        from pytaxize import Classification
+        from pytaxize.refactor import retry_budget
+        with retry_budget(100):
+            Classification([99208, 129313]).itis()
+    """
+    budget = _RetryBudget(retries)
+    token = _retry_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _retry_budget.reset(token)
+
+
+def retry_stats(reset=False):
+    """
+    Get retry metrics of the HTTP transport
+
+    :param reset: (bool) set the counters back to zero after reading them
+
+    :return: dict with ``retries`` (retries made), ``retry_time`` (seconds
+        spent waiting before retries), ``gave_up`` (calls that failed after
+        using all their retries) and ``budget_exhausted`` (calls not retried
+        because a `retry_budget` was spent)
+    """
+    out = _retry_stats.asdict()
+    if reset:
+        _retry_stats.reset()
+    return out
+
+
+def _may_retry(attempt):
+    if attempt >= _retry.retries:
+        _retry_stats.add(gave_up=1)
+        return False
+    budget = _retry_budget.get()
+    if budget is not None and not budget.take():
+        _retry_stats.add(budget_exhausted=1)
+        return False
+    return True
+
+
+def _rewind(files):
+    for value in (files or {}).values():
+        fileobj = value[1] if isinstance(value, tuple) else value
+        if hasattr(fileobj, "seek"):
+            fileobj.seek(0)
+
+
+_cache = None
+
+
+def enable_cache(path=None, ttl=7 * 86400, ttls=None, max_size=512 * 2**20):
+    """
+    Turn on the persistent HTTP response cache for all pytaxize requests
+
+    :param path: (str) path to the SQLite cache file, default
+        ``http_cache.sqlite`` in `pytaxize.cache.cache_dir`
+    :param ttl: (int) default time-to-live of cached responses, in seconds
+    :param ttls: (dict) time-to-live in seconds per provider or host, keyed
+        like `set_rate_limit` by `provider_hosts` keys (ncbi, itis, col, gn,
+        vascan) or host names
+    :param max_size: (int) maximum size of the cache in bytes; least recently
+        used responses are evicted beyond it
+
+    :return: the `pytaxize.cache.ResponseCache` in use
+
+    Usage::
+
+        from pytaxize.refactor import enable_cache, cache_stats
+        enable_cache(ttls={"itis": 30 * 86400})
+        from pytaxize import itis
+        itis.hierarchy_full(tsn=37906)
+        itis.hierarchy_full(tsn=37906)
+        cache_stats()
+    """
+    global _cache
+    hosts = {}
+    for provider, value in (ttls or {}).items():
+        for host in provider_hosts.get(provider, (provider,)):
+            hosts[host] = value
+    disable_cache()
+    _cache = ResponseCache(path, ttl, hosts, max_size)
+    return _cache
+
+
+def disable_cache():
+    """Turn off the persistent HTTP response cache"""
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = None
+
+
+def cache_stats():
+    """
+    Get hit/miss counts and size of the persistent HTTP response cache
+
+    :return: dict, or None if the cache is not enabled
+    """
+    return None if _cache is None else _cache.stats()
+
+
+def _cached_response(url, content, encoding, headers):
+    out = requests.Response()
+    out._content = content
+    # there is no connection behind it, so iter_content() and close() must
+    # not touch `raw`
+    out._content_consumed = True
+    out.status_code = 200
+    out.url = url
+    out.encoding = encoding
+    out.headers = requests.structures.CaseInsensitiveDict(headers)
+    return out
+
 
 class Refactor:
-    def __init__(self, url, payload={}, request="get"):
+    def __init__(self, url, payload={}, request="get", cache=True):
         self.url = url
         self.payload = payload
         self.request = request
+        # False for responses that change between calls, e.g. job status polls
+        self.cache = cache
+
+    def _method(self):
+        return "GET" if self.request == "get" else "POST"
 
     def return_requests(self, **kwargs):
-        if self.request == "get":
-            return requests.get(self.url, params=self.payload, **kwargs)
-        else:
-            return requests.post(self.url, params=self.payload, **kwargs)
+        _limiter.acquire(urlsplit(self.url).hostname)
+        return _pool.session().request(
+            self._method(), self.url, params=self.payload, **kwargs
+        )
 
-    def xml(self, **kwargs):
-        if self.request == "get":
-            out = requests.get(self.url, params=self.payload, **kwargs)
-            out.raise_for_status()
-            xmlparser = etree.XMLParser()
-            tt = etree.fromstring(out.content, xmlparser)
+    def _send(self, **kwargs):
+        attempt = 0
+        while True:
             try:
-                # If entrez api 'X-RateLimit-Remaining' header is 1 or below,
-                # pause for a second to allow rate limit to reset
-                if int(out.headers["X-RateLimit-Remaining"]) <= 1:
-                    time.sleep(1)
-            except Exception:
-                pass
-            return tt
-        else:
-            out = requests.post(self.url, params=self.payload, **kwargs)
-            out.raise_for_status()
-            xmlparser = etree.XMLParser()
-            tt = etree.fromstring(out.content, xmlparser)
-            return tt
+                out = self.return_requests(**kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if not _may_retry(attempt):
+                    raise
+                wait = _retry.delay(attempt)
+            else:
+                if out.status_code not in _retry.statuses:
+                    return out
+                wait = _retry.delay(attempt, out)
+                if wait is None:
+                    # Retry-After is longer than we are willing to wait
+                    _retry_stats.add(gave_up=1)
+                    return out
+                if not _may_retry(attempt):
+                    return out
+                out.close()
+            time.sleep(wait)
+            _retry_stats.add(retries=1, retry_time=wait)
+            _rewind(kwargs.get("files"))
+            attempt += 1
+
+    def _fetch(self, **kwargs):
+        cache = _cache if self.cache else None
+        key = None
+        if cache is not None and "files" not in kwargs and "data" not in kwargs:
+            host = urlsplit(self.url).hostname
+            key = cache.key(self._method(), self.url, self.payload, kwargs.get("json"))
+            hit = cache.get(key, host)
+            if hit is not None:
+                return _cached_response(self.url, *hit)
+        out = self._send(**kwargs)
+        out.raise_for_status()
+        if key is not None:
+            headers = {"Content-Type": out.headers.get("Content-Type", "")}
+            cache.set(key, host, out.content, out.encoding, headers)
+        return out
+
+    def xml(self, **kwargs):
+        out = self._fetch(**kwargs)
+        xmlparser = etree.XMLParser()
+        return etree.fromstring(out.content, xmlparser)
+
+    def iterxml(self, tag=None, **kwargs):
+        """
+        Parse an XML response incrementally as it is downloaded
+
+        Yields each element matching `tag` once its closing tag has been
+        read. Callers should ``clear()`` elements they are done with to
+        keep memory flat on large responses.
+        """
+        out = self._fetch(stream=True, **kwargs)
+        parser = etree.XMLPullParser(events=("end",), tag=tag)
+        try:
+            for chunk in out.iter_content(chunk_size=64 * 1024):
+                parser.feed(chunk)
+                for _, elem in parser.read_events():
+                    yield elem
+            parser.close()
+            for _, elem in parser.read_events():
+                yield elem
+        finally:
+            out.close()
 
     def json(self, **kwargs):
-        if self.request == "get":
-            out = requests.get(self.url, params=self.payload, **kwargs)
-            out.raise_for_status()
-            return out.json()
-        else:
-            out = requests.post(self.url, params=self.payload, **kwargs)
-            out.raise_for_status()
-            return out.json()
+        return self._fetch(**kwargs).json()
 
     def raw(self, **kwargs):
-        if self.request == "get":
-            out = requests.get(self.url, params=self.payload, **kwargs)
-            out.raise_for_status()
-            return out.text
-        else:
-            out = requests.post(self.url, params=self.payload, **kwargs)
-            out.raise_for_status()
-            return out.text
+        return self._fetch(**kwargs).text
@@ -4,7 +4,7 @@ from multipledispatch import dispatch
 
 from pytaxize.ids import Ids
 from pytaxize.itis import common_names
-from pytaxize.refactor import Refactor
+from pytaxize.ncbi.ncbi import _efetch_taxa
 
 
 @dispatch((str, list))
@@ -92,11 +92,11 @@ class CommonNames:
         if key is None:
             raise Exception("ENTREZ_KEY is not defined")
 
-        query = {"db": "taxonomy", "ID": x, "api_key": key}
-        url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
-        res = Refactor(url, query, "get").xml(**kwargs)
-        z = res.xpath("//TaxaSet/Taxon/OtherNames/GenbankCommonName")
-        return [w.text for w in z]
+        ids = x if isinstance(x, list) else [x]
+        out = []
+        for taxon in _efetch_taxa(ids, key, **kwargs):
+            out.extend(w.text for w in taxon.findall("OtherNames/GenbankCommonName"))
+        return out
 
     def itis(self, x, **kwargs):
         res = common_names(tsn=x)
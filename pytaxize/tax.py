@@ -1,12 +1,18 @@
 import csv
+import itertools
+import os
+import re
 import sys
+import warnings
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from importlib.resources import as_file, files
 
 import polars as pl
-import requests
 
 from pytaxize.itis.itis import _df
 from pytaxize.refactor import Refactor
+from pytaxize.utils import dedupe_names, fan_out, in_context, str2list
 
 
 class NoResultError(Exception):
@@ -95,11 +101,14 @@ def vascan_search(q, format="json", raw=False):
         url = "http://data.canadensys.net/vascan/api/0.1/search.xml"
 
     if len(q) > 1:
-        query = "\n".join(q)
-        payload = {"q": query}
         if format == "json":
+            # search each distinct name once, then give results for all names
+            names, index = dedupe_names(q)
+            payload = {"q": "\n".join(names)}
             out = Refactor(url, payload, request="post").json()
+            out["results"] = fan_out(out["results"], index)
         else:
+            payload = {"q": "\n".join(q)}
             out = Refactor(url, payload, request="post").raw()
         return out
     else:
@@ -179,13 +188,15 @@ def scrapenames(
 
         # Get data from text string as an R object
         pytaxize.scrapenames(text='A spider named Pardosa moesta Banks, 1892')
+
+        # Upload a file from your machine
+        pytaxize.scrapenames(file='paper.pdf')
     """
     method = {"url": url, "file": file, "text": text}
     method = {key: value for key, value in method.items() if value is not None}
     if len(method) > 1:
         sys.exit("Only one of url, file, or text can be used")
 
-    base = "https://finder.globalnames.org/api/v1/find"
     payload = {
         "url": url,
         "text": text,
@@ -196,28 +207,221 @@ def scrapenames(
         "all_data_sources": all_data_sources,
         "data_source_ids": data_source_ids,
     }
-    payload = {key: value for key, value in payload.items() if value is not None}
-    out = requests.post(base, json=payload)
-    out.raise_for_status()
-    res = out.json()
+    res = _scrape(payload, file)
     data = res["names"]
     meta = res
     meta.pop("names")
     if as_dataframe:
         data = _df(data, True)
     return {"meta": meta, "data": data}
-    # if out["status"] != 303:
-    #     sys.exit("Woops, something went wrong")
-    # else:
-    #     token_url = out["token_url"]
-    #     st = 303
-    #     while st == 303:
-    #         datout = requests_refactor(token_url, content=True)
-    #         st = datout["status"]
-    #     dd = pl.DataFrame(datout["names"])
-    #     datout.pop("names")
-    #     meta = datout
-    #     return {"meta": meta, "data": dd}
+
+
+_finder_url = "https://finder.globalnames.org/api/v1/find"
+
+
+def _scrape(payload, file=None):
+    payload = {key: value for key, value in payload.items() if value is not None}
+    req = Refactor(_finder_url, payload={}, request="post")
+    if file is None:
+        return req.json(json=payload)
+    # multipart/form-data: options go in as form fields next to the file
+    form = {
+        key: str(value).lower() if isinstance(value, bool) else str(value)
+        for key, value in payload.items()
+    }
+    with open(file, "rb") as f:
+        return req.json(files={"file": (os.path.basename(file), f)}, data=form)
+
+
+# places to cut a text, best first: blank lines, line ends, sentence ends
+# (not after a one or two letter word, e.g. the "P." of "P. moesta"), spaces
+_boundaries = [
+    re.compile(r"\n\s*\n"),
+    re.compile(r"\n"),
+    re.compile(r"(?<=\w{3}[.!?])\s+"),
+    re.compile(r"\s+"),
+]
+
+
+def _split_text(text, chunk_size):
+    """
+    Cut a text into pieces of at most `chunk_size` characters, at the best
+    boundary found in each window
+
+    :return: list of ``(offset, piece)`` tuples, `offset` being the position
+        of the piece in `text`
+    """
+    if chunk_size < 1:
+        raise ValueError("'chunk_size' must be at least 1")
+    out = []
+    start = 0
+    while len(text) - start > chunk_size:
+        window = text[start : start + chunk_size]
+        cut = None
+        for pattern in _boundaries:
+            ends = [m.end() for m in pattern.finditer(window) if m.end() < len(window)]
+            # do not settle for a boundary in the first half of the window
+            if ends and ends[-1] > chunk_size // 2:
+                cut = ends[-1]
+                break
+        if cut is None:
+            cut = chunk_size
+        out.append((start, window[:cut]))
+        start += cut
+    out.append((start, text[start:]))
+    return out
+
+
+def _merge_scraped(pieces, unique):
+    # names of all pieces of a document, offsets shifted back into the
+    # document; "total*" counts in the metadata are added up
+    names = []
+    seen = set()
+    meta = None
+    for offset, res in pieces:
+        res = dict(res)
+        for name in res.pop("names", None) or []:
+            if unique:
+                key = name.get("name", name.get("verbatim"))
+                if key in seen:
+                    continue
+                seen.add(key)
+            name = dict(name)
+            for field in ("start", "end"):
+                if isinstance(name.get(field), int):
+                    name[field] += offset
+            names.append(name)
+        if meta is None:
+            meta = res
+        else:
+            _add_totals(meta, res)
+    return meta or {}, names
+
+
+def _add_totals(meta, other):
+    for key, value in other.items():
+        if isinstance(value, dict) and isinstance(meta.get(key), dict):
+            _add_totals(meta[key], value)
+        elif (
+            key.startswith("total")
+            and isinstance(value, int)
+            and isinstance(meta.get(key), int)
+        ):
+            meta[key] += value
+
+
+_scrape_options = [
+    "engine",
+    "unique",
+    "verbatim",
+    "detect_language",
+    "all_data_sources",
+    "data_source_ids",
+]
+
+
+def scrapenames_batch(
+    texts=None,
+    files=None,
+    chunk_size=100000,
+    workers=4,
+    prefetch=8,
+    as_dataframe=False,
+    **kwargs,
+):
+    """
+    Find names in many documents, splitting large texts into pieces
+
+    Texts longer than `chunk_size` characters are cut at blank lines, line
+    ends, sentence ends or spaces (the best found) and the pieces are sent
+    separately; files are uploaded whole. Requests run concurrently and the
+    names of each document are merged, with name offsets relative to the
+    whole text, and yielded as soon as the document is done, in input order.
+    Only the next `prefetch` documents are sent ahead of the one being read,
+    so `texts` and `files` may be iterators over very many documents.
+
+    A piece that fails gives a warning, and its document is given the names
+    of its other pieces.
+
+    :param texts: a string, or list (or iterator) of strings
+    :param files: a path, or list (or iterator) of paths to files (e.g.
+      PDFs), sent as multipart/form-data; these come after `texts` in the
+      results
+    :param chunk_size: (int) maximum number of characters sent per request,
+      at least 1
+    :param workers: (int) maximum number of requests in flight
+    :param prefetch: (int) number of documents sent ahead of the one being
+      yielded
+    :param as_dataframe: (optional) Type: boolean. Give the names of each
+      document as a data frame
+    :param **kwargs: further arguments of `scrapenames`, e.g. ``unique``,
+      ``verbatim`` or ``data_source_ids``
+
+    :return: generator of dicts with ``meta`` and ``data``, as
+      `scrapenames` returns them, one per document
+
+    Usage::
+
+        from pytaxize import tax
+        texts = ['A spider named Pardosa moesta Banks, 1892', 'Poa annua L.']
+        for x in tax.scrapenames_batch(texts=texts):
+            print(x['data'])
+        res = tax.scrapenames_batch(files=['a.pdf', 'b.pdf'], workers=2)
+        next(res)
+        res.close()
+    """
+    unknown = set(kwargs) - set(_scrape_options)
+    if unknown:
+        raise TypeError(f"unexpected arguments: {', '.join(sorted(unknown))}")
+    if chunk_size < 1:
+        raise ValueError("'chunk_size' must be at least 1")
+    if isinstance(texts, str):
+        texts = str2list(texts)
+    if isinstance(files, str):
+        files = str2list(files)
+    return _scrape_batch(
+        texts, files, chunk_size, workers, prefetch, as_dataframe, dict(kwargs)
+    )
+
+
+def _scrape_batch(texts, files, chunk_size, workers, prefetch, as_dataframe, payload):
+    def scrape_text(piece):
+        return _scrape({**payload, "text": piece})
+
+    def scrape_file(path):
+        return _scrape(payload, file=path)
+
+    scrape_text = in_context(scrape_text)
+    scrape_file = in_context(scrape_file)
+    # (function, pieces) per document, made as documents are reached
+    docs = itertools.chain(
+        ((scrape_text, _split_text(w, chunk_size)) for w in texts or []),
+        ((scrape_file, [(0, w)]) for w in files or []),
+    )
+    pool = ThreadPoolExecutor(max(1, workers))
+    try:
+        queue = deque()
+        i = 0
+        while True:
+            for func, pieces in itertools.islice(docs, max(1, prefetch) - len(queue)):
+                queue.append([(w, pool.submit(func, piece)) for w, piece in pieces])
+            if not queue:
+                return
+            pieces = []
+            for offset, future in queue.popleft():
+                try:
+                    pieces.append((offset, future.result()))
+                except Exception as err:
+                    warnings.warn(
+                        f"Scraping names from document {i} at {offset} failed: {err}"
+                    )
+            meta, data = _merge_scraped(pieces, payload.get("unique"))
+            if as_dataframe:
+                data = _df(data, True)
+            yield {"meta": meta, "data": data}
+            i += 1
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
 
 
 if __name__ == "__main__":
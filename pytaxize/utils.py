@@ -1,3 +1,5 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from functools import reduce
 
 
@@ -28,3 +30,73 @@ def lists2dict(vals, names):
     if not isinstance(names, list):
         raise TypeError("'names' must be of class list")
     return dict(zip(names, vals))
+
+
+def normalize_name(name):
+    """Lower case `name` and collapse runs of whitespace to single spaces"""
+    return " ".join(name.split()).lower()
+
+
+def dedupe_names(names):
+    """
+    Find the distinct names in a list, ignoring case and extra whitespace
+
+    :return: tuple ``(unique, index)``, where `unique` is a list holding the
+        first spelling of each distinct name, and `index` gives for every
+        position in `names` the position of its name in `unique`, see
+        `fan_out`
+    """
+    seen = {}
+    unique = []
+    index = []
+    for name in names:
+        key = normalize_name(name)
+        if key not in seen:
+            seen[key] = len(unique)
+            unique.append(name)
+        index.append(seen[key])
+    return unique, index
+
+
+def fan_out(results, index):
+    """
+    Map results for the distinct names of `dedupe_names` back to all the
+    original positions; repeated names share the same result object
+    """
+    return [results[i] for i in index]
+
+
+def in_context(func):
+    """
+    Wrap `func` to run in a copy of the calling context, e.g. with the
+    caller's `refactor.retry_budget`, when it is called from another thread
+    """
+    context = contextvars.copy_context()
+
+    def call(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+
+    return call
+
+
+def run_concurrent(func, items, workers=16):
+    """
+    Call `func` on every item using a pool of threads, in the context of the
+    caller (see `in_context`)
+
+    :return: list of ``(result, error)`` tuples in the order of `items`, where
+        `error` is the exception raised for that item, or None
+    """
+    func = in_context(func)
+
+    def call(item):
+        try:
+            return func(item), None
+        except Exception as err:
+            return None, err
+
+    items = list(items)
+    if len(items) == 0:
+        return []
+    with ThreadPoolExecutor(max_workers=max(min(workers, len(items)), 1)) as pool:
+        return list(pool.map(call, items))
@@ -0,0 +1,62 @@
+"""Tests for the asyncio interface of pytaxize"""
+import asyncio
+import inspect
+
+import vcr
+
+from pytaxize import refactor
+from pytaxize.aio import _asyncify, _asyncify_iter, col, itis, tax
+
+
+class TestAio:
+    @vcr.use_cassette("test/vcr_cassettes/itis_common_names.yml")
+    def test_aio_itis_common_names(self):
+        "aio: itis.common_names"
+        common_names = asyncio.run(itis.common_names(tsn=180543))
+        assert set(common_names[1]) == set(["commonName", "language", "tsn"])
+
+    @vcr.use_cassette("test/vcr_cassettes/col_children.yml")
+    def test_aio_col_children(self):
+        "aio: col.children"
+        res = asyncio.run(col.children(name=["Apis"]))
+        assert isinstance(res, list)
+        assert isinstance(res[0][0], dict)
+
+    def test_aio_keeps_signature(self):
+        "aio: twins keep the name and docs of the sync functions"
+        assert itis.hierarchy_full.__name__ == "hierarchy_full"
+        assert asyncio.iscoroutinefunction(itis.hierarchy_full)
+
+    def test_aio_keeps_retry_budget(self):
+        "aio: calls run with the retry budget of the calling task"
+        get_budget = _asyncify(lambda: refactor._retry_budget.get())
+
+        async def main():
+            with refactor.retry_budget(5) as budget:
+                return budget, await get_budget()
+
+        budget, seen = asyncio.run(main())
+        assert seen is budget
+
+    def test_aio_generators(self):
+        "aio: generators become async generators and are closed early"
+        closed = []
+
+        def numbers(n):
+            try:
+                yield from range(n)
+            finally:
+                closed.append(n)
+
+        anumbers = _asyncify_iter(numbers)
+
+        async def main():
+            assert [w async for w in anumbers(3)] == [0, 1, 2]
+            res = anumbers(100)
+            assert await res.__anext__() == 0
+            await res.aclose()
+
+        asyncio.run(main())
+        assert closed == [3, 100]
+        assert inspect.isasyncgenfunction(itis.search_any_match)
+        assert inspect.isasyncgenfunction(tax.scrapenames_batch)
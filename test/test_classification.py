@@ -0,0 +1,126 @@
+"""Tests for Classification module of pytaxize"""
+
+import pytest
+
+from pytaxize import itis, lineage
+from pytaxize.classification import Classification, classification
+
+
+def _record(tsn, parent, name):
+    return {
+        "author": "",
+        "parentName": "",
+        "parentTsn": parent,
+        "rankName": "",
+        "taxonName": name,
+        "tsn": tsn,
+    }
+
+
+_tree = {
+    "1": _record("1", "", "Animalia"),
+    "2": _record("2", "1", "Ursus"),
+    "3": _record("3", "2", "Ursus arctos"),
+    "4": _record("4", "2", "Ursus americanus"),
+    "5": _record("5", "2", "Ursus maritimus"),
+}
+
+
+@pytest.fixture
+def fake_itis(monkeypatch):
+    calls = []
+
+    def hierarchy_full(tsn):
+        calls.append(("full", tsn))
+        up, tsn = [], str(tsn)
+        while tsn:
+            up.insert(0, _tree[tsn])
+            tsn = _tree[tsn]["parentTsn"]
+        kids = [w for w in _tree.values() if w["parentTsn"] == up[-1]["tsn"]]
+        itis.itis._remember(up + kids)
+        return up + kids
+
+    def hierarchy_up(tsn):
+        calls.append(("up", tsn))
+        itis.itis._remember([_tree[str(tsn)]])
+        return _tree[str(tsn)]
+
+    lineage.itis_ancestors.clear()
+    monkeypatch.setattr(classification, "hierarchy_full", hierarchy_full)
+    monkeypatch.setattr(classification, "hierarchy_up", hierarchy_up)
+    yield calls
+    lineage.itis_ancestors.clear()
+
+
+class TestClassification:
+    def test_classification_itis_cache(self, fake_itis):
+        "Classification: siblings are answered from known ancestors"
+        res = Classification([3, 4, 5]).itis(cache=True)
+        assert [w["taxonName"] for w in res[4]] == [
+            "Animalia",
+            "Ursus",
+            "Ursus americanus",
+        ]
+        assert fake_itis == [("up", 3), ("full", "2")]
+        Classification([3, 4]).itis(cache=True)
+        assert len(fake_itis) == 2
+
+    def test_classification_itis_no_cache(self, fake_itis):
+        "Classification: without cache each id fetches its full hierarchy"
+        res = Classification([3, 4]).itis()
+        assert fake_itis == [("full", 3), ("full", 4)]
+        assert len(res[3]) == 3
+
+    def test_ancestor_store_ncbi_paths(self):
+        "Classification: ancestors of NCBI lineages are known too"
+        store = lineage.AncestorStore()
+        path = [
+            {"ScientificName": "Eukaryota", "Rank": "superkingdom", "TaxId": "2759"},
+            {"ScientificName": "Homo", "Rank": "genus", "TaxId": "9605"},
+            {"ScientificName": "Homo sapiens", "Rank": "species", "TaxId": "9606"},
+        ]
+        store.add_path(path, "TaxId")
+        assert store.lineage(9605) == path[:2]
+        assert store.lineage(9606) == path
+        assert store.lineage(9598) is None
+
+    def test_ancestor_store_is_opt_in(self, fake_itis):
+        "Classification: responses are only kept when cache=True asks for them"
+        Classification([3, 4]).itis()
+        itis.itis._remember([_tree["1"]])
+        assert len(lineage.itis_ancestors) == 0
+        Classification([3]).itis(cache=True)
+        assert len(lineage.itis_ancestors) > 0
+        itis.set_backend(None)
+        assert len(lineage.itis_ancestors) == 0
+
+    def test_ancestor_store_is_bounded(self):
+        "Classification: the least recently used taxa are dropped past maxsize"
+        store = lineage.AncestorStore(maxsize=2)
+        store.add("1", None, _tree["1"])
+        store.add("2", "1", _tree["2"])
+        assert store.lineage(1) is not None
+        store.add("3", "2", _tree["3"])
+        assert len(store) == 2
+        assert "1" in store and "2" not in store
+
+    def test_classification_itis_compact(self, fake_itis):
+        "Classification: compact lineages share interned nodes"
+        res = Classification([3, 4]).itis(cache=True, compact=True)
+        assert res[3][0] is res[4][0]
+        assert res[3][1] is res[4][1]
+        assert res[3][-1] == _tree["3"]
+        assert res[3][-1]["taxonName"] == "Ursus arctos"
+
+    def test_lineage_node(self):
+        "Classification: lineage nodes read like dicts"
+        record = {"ScientificName": "Eukaryota", "Rank": "domain", "TaxId": "2759"}
+        node = lineage.LineageNode.of(record)
+        assert node is lineage.LineageNode.of(dict(record))
+        assert node == record
+        assert dict(node) == record
+        assert node.get("Rank") == "domain"
+        assert list(node) == ["ScientificName", "Rank", "TaxId"]
+        with pytest.raises(KeyError):
+            node["rank"]
+        assert not hasattr(node, "__dict__")
@@ -1,4 +1,6 @@
 """Tests for GNI module of pytaxize"""
+import threading
+import time
 import unittest
 
 import vcr
@@ -112,6 +114,99 @@ c = {
 }
 
 
+# Global Names parser results (in the format of `b`) for names with
+# authorship, years and ranks, transcribed by hand rather than recorded;
+# only the fields listed are compared with the local engine
+d = [
+    {
+        "canonical": "Parus major",
+        "details": [
+            {
+                "genus": {"string": "Parus"},
+                "species": {
+                    "string": "major",
+                    "basionymAuthorTeam": {
+                        "authorTeam": "Linnaeus",
+                        "author": ["Linnaeus"],
+                        "year": "1758",
+                    },
+                    "authorship": "Linnaeus, 1758",
+                },
+            }
+        ],
+        "positions": {
+            "0": ["genus", 5],
+            "6": ["species", 11],
+            "12": ["author_word", 20],
+            "22": ["year", 26],
+        },
+        "verbatim": "Parus major Linnaeus, 1758",
+    },
+    {
+        "canonical": "Salix repens argentea",
+        "details": [
+            {
+                "genus": {"string": "Salix"},
+                "species": {"string": "repens"},
+                "infraspecies": [
+                    {
+                        "string": "argentea",
+                        "basionymAuthorTeam": {
+                            "authorTeam": "Sm.",
+                            "author": ["Sm."],
+                        },
+                        "combinationAuthorTeam": {
+                            "authorTeam": "Wimm. & Grab.",
+                            "author": ["Wimm.", "Grab."],
+                        },
+                        "authorship": "(Sm.) Wimm. & Grab.",
+                        "rank": "var.",
+                    }
+                ],
+            }
+        ],
+        "positions": {
+            "0": ["genus", 5],
+            "6": ["species", 12],
+            "13": ["infraspecific_type", 17],
+            "18": ["infraspecies", 26],
+            "28": ["author_word", 31],
+            "33": ["author_word", 38],
+            "41": ["author_word", 46],
+        },
+        "verbatim": "Salix repens var. argentea (Sm.) Wimm. & Grab.",
+    },
+    {
+        "canonical": "Puma concolor coryi",
+        "details": [
+            {
+                "genus": {"string": "Puma"},
+                "species": {"string": "concolor"},
+                "infraspecies": [
+                    {
+                        "string": "coryi",
+                        "basionymAuthorTeam": {
+                            "authorTeam": "Bangs",
+                            "author": ["Bangs"],
+                            "year": "1899",
+                        },
+                        "authorship": "Bangs, 1899",
+                    }
+                ],
+            }
+        ],
+        "positions": {
+            "0": ["genus", 4],
+            "5": ["species", 13],
+            "14": ["infraspecies", 19],
+            "20": ["author_word", 25],
+            "27": ["year", 31],
+        },
+        "verbatim": "Puma concolor coryi Bangs, 1899",
+    },
+]
+
+
 class TestGni:
     @vcr.use_cassette("test/vcr_cassettes/gn_parse.yml")
     def test_gni_parse(self):
@@ -123,7 +218,65 @@ class TestGni:
         "gn.search"
         assert c == gn.search("ani*", per_page=1)
 
+    def test_gni_iter_search(self, monkeypatch):
+        "gn.iter_search walks all pages up to the reported total"
+        pages = []
+        done = []
+        lock = threading.Lock()
+
+        def fake(search_term, per_page=30, page=1):
+            with lock:
+                pages.append(page)
+            time.sleep(0.01)
+            done.append(page)
+            names = [{"id": i} for i in range((page - 1) * per_page, page * per_page)]
+            return {"name_strings": names, "name_strings_total": 95}
+
+        monkeypatch.setattr(gn.gni, "search", fake)
+        res = list(gn.iter_search("ani*", per_page=10, prefetch=3))
+        assert [w["id"] for w in res] == list(range(100))
+        assert sorted(pages) == list(range(1, 11))
+
+        pages.clear()
+        done.clear()
+        res = gn.iter_search("ani*", per_page=10, prefetch=3)
+        assert [next(res)["id"] for _ in range(15)] == list(range(15))
+        res.close()
+        # no request left in flight, none beyond the prefetch window
+        assert sorted(done) == sorted(pages)
+        assert max(pages) <= 4
+
     @vcr.use_cassette("test/vcr_cassettes/gn_details.yml")
     def test_gni_details(self):
         "gn.details"
         assert a == gn.details(id=17802847)
+
+    def test_gni_parse_local(self):
+        "gn.parse with the local engine agrees with the remote parser"
+        res = gn.parse(
+            names=["Cyanistes caeruleus", "Helianthus annuus"], engine="local"
+        )
+
+        def drop_run(x):
+            x = dict(x["scientificName"])
+            del x["parser_version"], x["parser_run"]
+            return x
+
+        assert [drop_run(w) for w in b] == [drop_run(w) for w in res]
+
+    def test_gni_parse_local_authorship(self):
+        "gn.parse with the local engine parses authors, years and ranks"
+        res = gn.parse(names=[w["verbatim"] for w in d], engine="local")
+        for x, y in zip(res, d):
+            assert {k: x["scientificName"][k] for k in y} == y
+        res = gn.parse(names=["sp. nov."], engine="local")
+        assert res[0]["scientificName"]["parsed"] is False
+
+    def test_gni_parse_local_copies(self):
+        "gn.parse with the local engine gives each call its own result"
+        res = gn.parse(names=["Poa annua L."], engine="local")
+        res[0]["scientificName"]["canonical"] = "changed"
+        res[0]["scientificName"]["details"][0]["genus"]["string"] = "changed"
+        res = gn.parse(names=["Poa annua L."], engine="local")
+        assert res[0]["scientificName"]["canonical"] == "Poa annua"
+        assert res[0]["scientificName"]["details"][0]["genus"]["string"] == "Poa"
@@ -1,4 +1,5 @@
 """Tests for GNR module of pytaxize"""
+import pytest
 import vcr
 
 from pytaxize import gn
@@ -32,6 +33,66 @@ class TestGnr:
         "gn.resolve"
         assert exp1 == gn.resolve("Helianthus annus")[0][0]
 
+    def test_gnr_resolve_post_from_memory(self, monkeypatch, tmp_path):
+        "gn.resolve uploads long name lists from memory and polls adaptively"
+        uploads = []
+        sleeps = []
+        polls = []
+
+        class Fake:
+            def __init__(self, url, payload={}, request="get", cache=True):
+                self.url = url
+                self.cache = cache
+
+            def json(self, files=None):
+                if files is not None:
+                    uploads.append(files["file"][1].read().decode())
+                    return {"status": "working", "url": "https://x/job"}
+                polls.append(self.cache)
+                status = "working" if len(polls) < 3 else "success"
+                data = [{"results": [w]} for w in uploads[0].split()]
+                return {"status": status, "url": "https://x/job", "data": data}
+
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(gn.gnr, "Refactor", Fake)
+        monkeypatch.setattr(gn.gnr.time, "sleep", sleeps.append)
+        names = [f"name{i}" for i in range(400)]
+        res = gn.gnr._gnr_resolve(names)
+        assert res[0] == ["name0"] and len(res) == 400
+        assert uploads[0].splitlines() == names
+        assert list(tmp_path.iterdir()) == []
+        assert sleeps == [0.5, 0.75, 1.125]
+        assert polls == [False] * 3
+
+    def test_gnr_resolve_chunks_concurrently(self, monkeypatch):
+        "gn.resolve resolves chunks concurrently, in order, keeping failures apart"
+
+        def fake(names, *args):
+            if names[0] == "n1000":
+                raise ValueError("boom")
+            return [[w] for w in names]
+
+        monkeypatch.setattr(gn.gnr, "_gnr_resolve", fake)
+        names = [f"n{i}" for i in range(2500)]
+        with pytest.warns(UserWarning, match="1000 names from 'n1000'"):
+            res = gn.resolve(names, workers=3)
+        assert len(res) == 2500
+        assert res[999] == ["n999"] and res[2000] == ["n2000"]
+        assert res[1000] == [] and res[1999] == []
+
+    def test_gnr_resolve_dedupes_names(self, monkeypatch):
+        "gn.resolve resolves repeated names once"
+        seen = []
+
+        def fake(names, *args):
+            seen.extend(names)
+            return [[w] for w in names]
+
+        monkeypatch.setattr(gn.gnr, "_gnr_resolve", fake)
+        res = gn.resolve(["Poa annua", "poa  annua", "Pinus", "Poa annua"])
+        assert seen == ["Poa annua", "Pinus"]
+        assert res == [["Poa annua"], ["Poa annua"], ["Pinus"], ["Poa annua"]]
+
 
 # def test_gnr_resolve_remove_temporary_file():
 #   """test if delete temporary name list file in gnr_resolve"""
@@ -1,6 +1,6 @@
 import vcr
 
-from pytaxize.ids import Ids
+from pytaxize.ids import Ids, ids
 
 
 class TestIds:
@@ -16,6 +16,15 @@ class TestIds:
         assert len(x.ids) > 0
         assert x.db_ids == "ncbi"
 
+    @vcr.use_cassette("test/vcr_cassettes/ids_ncbi.yml",
+      filter_query_parameters=['api_key'])
+    def test_ids_ncbi_repeated_names(self):
+        "Ids: repeated names are looked up once"
+        x = Ids(["Poa annua", "poa  annua", "Poa annua"])
+        x.ncbi()
+        assert list(x.ids.keys()) == ["Poa annua", "poa  annua"]
+        assert x.ids["Poa annua"] == x.ids["poa  annua"]
+
     @vcr.use_cassette("test/vcr_cassettes/ids_gbif_single_name.yml")
     def test_ids_gbif_single_name(self):
         self.individual_id_retrieval("gbif","Panthera tigris")
@@ -28,9 +37,18 @@ class TestIds:
     def test_ids_itis_single_name(self):
         self.individual_id_retrieval("itis","Panthera tigris")
 
-    @vcr.use_cassette("test/vcr_cassettes/ids_itis_list_of_names.yml")
-    def test_ids_itis_list_of_names(self):
-        self.individual_id_retrieval("itis",["Panthera tigris","Panthera leo"])
+    def test_ids_itis_list_of_names(self, monkeypatch):
+        "Ids: itis looks up each distinct name on its own"
+        seen = []
+
+        def terms(x, what):
+            seen.append(x)
+            return [{"tsn": str(len(seen)), "scientificName": x}]
+
+        monkeypatch.setattr(ids, "terms", terms)
+        names = ["Panthera tigris", "Panthera leo", "panthera  tigris"]
+        self.individual_id_retrieval("itis", names)
+        assert seen == ["Panthera tigris", "Panthera leo"]
 
     def individual_id_retrieval(self,db,data):
         expected_data = data
@@ -1,4 +1,9 @@
 """Tests for ITIS module of pytaxize"""
+import functools
+import threading
+
+import polars as pl
+import pytest
 import vcr
 
 from pytaxize import itis
@@ -41,3 +46,294 @@ class TestITIS:
         "ITIS: common_names"
         common_names = itis.common_names(tsn=180543, as_dataframe=False)
         assert set(common_names[1]) == set(["commonName", "language", "tsn"])
+
+    @vcr.use_cassette("test/vcr_cassettes/itis_comment_detail.yml")
+    def test_itis_memo(self):
+        "ITIS: per-TSN responses are memoized and copied on return"
+        itis.memo_clear()
+        first = itis.comment_detail(tsn=180543)
+        first[0]["commentDetail"] = "changed"
+        second = itis.comment_detail(tsn=180543)
+        assert second[0]["commentDetail"] != "changed"
+        info = itis.memo_info()
+        assert info["hits"] == 1
+        assert info["misses"] == 1
+        assert info["size"] == 1
+
+    @vcr.use_cassette("test/vcr_cassettes/children_itis.yml")
+    def test_itis_batch(self):
+        "ITIS: batch runs a per-TSN function over many TSNs in order"
+        # cassette playback is not thread-safe, so one request at a time
+        itis.memo_clear()
+        tsns = [179913, 174321, 9999999]
+        res, errors = itis.batch(itis.hierarchy_down, tsns, workers=1)
+        assert errors == {}
+        assert len(res) == 3
+        assert res[0][0]["parentTsn"] == "179913"
+        assert res[1][0]["parentTsn"] == "174321"
+        assert res[2] == [None]
+
+    @vcr.use_cassette("test/vcr_cassettes/children_itis.yml")
+    def test_itis_batch_dataframe(self):
+        "ITIS: batch combines results into one data frame"
+        itis.memo_clear()
+        tsns = [179913, 174321, 9999999]
+        df, errors = itis.batch("hierarchy_down", tsns, workers=1, as_dataframe=True)
+        assert df["input_tsn"].unique().sort().to_list() == [174321, 179913]
+        assert "taxonName" in df.columns
+
+    def test_itis_batch_dataframe_partial(self):
+        "ITIS: batch builds data frames for callables without a name"
+
+        def func(tsn, rank):
+            return [{"tsn": str(tsn), "rankName": rank}]
+
+        func = functools.partial(func, rank="Genus")
+        df, errors = itis.batch(func, [1, 2], as_dataframe=True)
+        assert df["input_tsn"].to_list() == [1, 2]
+        assert df["rankName"].to_list() == ["Genus", "Genus"]
+
+    @vcr.use_cassette("test/vcr_cassettes/itis_common_names.yml")
+    def test_itis_as_dataframe(self):
+        "ITIS: as_dataframe builds a frame with the declared column types"
+        df = itis.common_names(180543, as_dataframe=True)
+        assert df.columns == ["commonName", "language", "tsn"]
+        assert df.shape == (3, 3)
+        assert df["tsn"].dtype == pl.Int64
+        assert df["commonName"].to_list()[1] == "Grizzly Bear"
+
+    def test_itis_batch_collects_errors(self):
+        "ITIS: batch collects per-item errors instead of aborting"
+
+        def func(tsn):
+            if tsn == 2:
+                raise ValueError("bad tsn")
+            return {"tsn": tsn}
+
+        with pytest.warns(UserWarning):
+            res, errors = itis.batch(func, [1, 2, 3])
+        assert res == [{"tsn": 1}, None, {"tsn": 3}]
+        assert list(errors) == [2]
+        assert isinstance(errors[2], ValueError)
+
+    def test_itis_taxon_record(self, monkeypatch):
+        "ITIS: TaxonRecord derives accessors from one full record"
+        itis.memo_clear()
+        with vcr.use_cassette("test/vcr_cassettes/itis_common_names.yml"):
+            names = itis.itis._tsn_get("getCommonNamesFromTSN", 180543)
+        with vcr.use_cassette("test/vcr_cassettes/itis_comment_detail.yml"):
+            comments = itis.itis._tsn_get("getCommentDetailFromTSN", 180543)
+        calls = []
+
+        def full_record(tsn):
+            calls.append(tsn)
+            return {"commonNameList": names, "commentList": comments}
+
+        monkeypatch.setattr(itis.itis, "full_record", full_record)
+        x = itis.TaxonRecord(180543)
+        assert calls == []
+        assert x.common_names() == itis.common_names(180543)
+        assert x.comment_detail() == itis.comment_detail(180543)
+        assert x.common_names() == x.common_names()
+        assert calls == [180543]
+
+    @vcr.use_cassette("test/vcr_cassettes/children_itis.yml")
+    def test_itis_downstream(self):
+        "ITIS: downstream stops at the requested rank"
+        res = itis.downstream(179913, downto="Subclass")
+        assert [w["taxonName"] for w in res] == ["Prototheria", "Theria"]
+        assert all(w["rankName"] == "Subclass" for w in res)
+
+    def test_itis_downstream_fail_well(self):
+        "ITIS: downstream rejects unknown ranks"
+        with pytest.raises(ValueError):
+            itis.downstream(179913, downto="Clade")
+
+    def test_itis_reference_tables_persist(self, monkeypatch, tmp_path):
+        "ITIS: reference vocabularies are fetched once and kept on disk"
+        calls = []
+
+        class Fake:
+            def __init__(self, url, payload={}, request="get"):
+                calls.append(url)
+
+            def json(self, **kwargs):
+                return {"class": "x", "jurisdictionValues": ["Alaska", "Hawaii"]}
+
+        monkeypatch.setenv("PYTAXIZE_CACHE_DIR", str(tmp_path))
+        monkeypatch.setattr(itis.itis, "Refactor", Fake)
+        monkeypatch.setattr(itis.itis, "_reference", itis.itis._ReferenceTables())
+        assert itis.jurisdiction_values() == ["Alaska", "Hawaii"]
+        assert itis.jurisdiction_values() == ["Alaska", "Hawaii"]
+        assert len(calls) == 1
+        # a new process reads the values back from disk
+        monkeypatch.setattr(itis.itis, "_reference", itis.itis._ReferenceTables())
+        assert itis.jurisdiction_values() == ["Alaska", "Hawaii"]
+        assert len(calls) == 1
+        itis.jurisdiction_values(refresh=True)
+        assert len(calls) == 2
+
+    def test_itis_reference_tables_without_cache_dir(self, monkeypatch, tmp_path):
+        "ITIS: reference vocabularies stay in memory without a cache directory"
+        calls = []
+
+        class Fake:
+            def __init__(self, url, payload={}, request="get"):
+                calls.append(url)
+
+            def json(self, **kwargs):
+                return {"class": "x", "jurisdictionValues": ["Alaska"]}
+
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+        monkeypatch.setenv("PYTAXIZE_CACHE_DIR", str(blocker / "cache"))
+        monkeypatch.setattr(itis.itis, "Refactor", Fake)
+        monkeypatch.setattr(itis.itis, "_reference", itis.itis._ReferenceTables())
+        assert itis.jurisdiction_values() == ["Alaska"]
+        assert itis.jurisdiction_values() == ["Alaska"]
+        assert len(calls) == 1
+
+    def test_itis_reference_tables_fetch_independently(self, monkeypatch, tmp_path):
+        "ITIS: one slow vocabulary does not hold up the others"
+        started = threading.Event()
+        release = threading.Event()
+        done = []
+
+        class Fake:
+            def __init__(self, url, payload={}, request="get"):
+                self.url = url
+
+            def json(self, **kwargs):
+                if self.url.endswith("getJurisdictionValues"):
+                    started.set()
+                    release.wait(5)
+                    done.append("slow")
+                    return {"class": "x", "jurisdictionValues": ["Alaska"]}
+                return {"class": "x", "originValues": []}
+
+        monkeypatch.setenv("PYTAXIZE_CACHE_DIR", str(tmp_path))
+        monkeypatch.setattr(itis.itis, "Refactor", Fake)
+        monkeypatch.setattr(itis.itis, "_reference", itis.itis._ReferenceTables())
+        slow = threading.Thread(target=itis.jurisdiction_values)
+        slow.start()
+        started.wait(5)
+        try:
+            itis.itis._reference.get("getJurisdictionalOriginValues")
+            done.append("fast")
+        finally:
+            release.set()
+            slow.join()
+        assert done == ["fast", "slow"]
+
+    def test_itis_search_any_match_pages(self, monkeypatch):
+        "ITIS: search_any_match yields records page by page"
+        pages = []
+
+        class Fake:
+            def __init__(self, url, payload={}, request="get"):
+                self.payload = payload
+
+            def json(self, **kwargs):
+                page = self.payload["pageNum"]
+                pages.append(page)
+                size = self.payload["pageSize"] if page < 3 else 1
+                match = {
+                    "class": "x",
+                    "commonNameList": {"class": "x", "commonNames": [None]},
+                    "sciName": f"Zy {page}",
+                }
+                return {"anyMatchList": [dict(match) for _ in range(size)]}
+
+        monkeypatch.setattr(itis.itis, "Refactor", Fake)
+        res = itis.search_any_match("Zy", page_size=2)
+        assert next(res) == {"sciName": "Zy 1", "commonNames": []}
+        res.close()
+        assert max(pages) <= 2
+        res = list(itis.search_any_match("Zy", page_size=2))
+        assert [w["sciName"] for w in res] == ["Zy 1"] * 2 + ["Zy 2"] * 2 + ["Zy 3"]
+
+
+_itis_fixture = """
+CREATE TABLE kingdoms (kingdom_id INTEGER, kingdom_name TEXT);
+CREATE TABLE taxon_unit_types (kingdom_id INTEGER, rank_id INTEGER, rank_name TEXT);
+CREATE TABLE taxon_authors_lkp (taxon_author_id INTEGER, taxon_author TEXT);
+CREATE TABLE taxonomic_units (
+    tsn INTEGER, complete_name TEXT, parent_tsn INTEGER, name_usage TEXT,
+    kingdom_id INTEGER, rank_id INTEGER, taxon_author_id INTEGER,
+    credibility_rtng TEXT, completeness_rtng TEXT, currency_rating TEXT
+);
+CREATE TABLE vernaculars (
+    tsn INTEGER, vernacular_name TEXT, language TEXT, vern_id INTEGER
+);
+CREATE TABLE synonym_links (tsn INTEGER, tsn_accepted INTEGER);
+INSERT INTO kingdoms VALUES (5, 'Animalia');
+INSERT INTO taxon_unit_types VALUES
+    (5, 10, 'Kingdom'), (5, 60, 'Class'), (5, 70, 'Subclass'),
+    (5, 180, 'Genus'), (5, 220, 'Species');
+INSERT INTO taxon_authors_lkp VALUES
+    (1, 'Linnaeus, 1758'), (2, 'Gill, 1872'), (3, 'Parker and Haswell, 1897'),
+    (4, 'Ord, 1815');
+INSERT INTO taxonomic_units VALUES
+    (202423, 'Animalia', 0, 'valid', 5, 10, NULL, 'TWG standards met', '', ''),
+    (179913, 'Mammalia', 202423, 'valid', 5, 60, 1, 'TWG standards met', '', ''),
+    (179914, 'Prototheria', 179913, 'valid', 5, 70, 2, '', '', ''),
+    (179916, 'Theria', 179913, 'valid', 5, 70, 3, '', '', ''),
+    (180541, 'Ursus', 179916, 'valid', 5, 180, 1, '', '', ''),
+    (180543, 'Ursus arctos', 180541, 'valid', 5, 220, 1,
+        'TWG standards met', 'complete', ''),
+    (180544, 'Ursus horribilis', 180541, 'invalid', 5, 220, 4, '', '', '');
+INSERT INTO vernaculars VALUES
+    (180543, 'Brown Bear', 'English', 1), (180543, 'Grizzly Bear', 'English', 2),
+    (180543, 'Oso pardo', 'Spanish', 3);
+INSERT INTO synonym_links VALUES (180544, 180543);
+"""
+
+
+@pytest.fixture
+def itis_db(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "ITIS.sqlite")
+    conn = sqlite3.connect(path)
+    conn.executescript(_itis_fixture)
+    conn.close()
+    db = itis.ItisDatabase(path)
+    itis.set_backend(db)
+    yield db
+    itis.set_backend(None)
+    db.close()
+
+
+class TestITISDatabase:
+    def test_itis_database_matches_web_service(self, itis_db):
+        "ITIS: local database answers have the web service shape"
+        itis.set_backend(None)
+        with vcr.use_cassette("test/vcr_cassettes/itis_common_names.yml"):
+            web_names = itis.common_names(180543)
+        with vcr.use_cassette("test/vcr_cassettes/children_itis.yml"):
+            web_down = itis.hierarchy_down(179913)
+        itis.set_backend(itis_db)
+        assert itis.common_names(180543) == web_names
+        assert itis.hierarchy_down(179913) == web_down
+
+    def test_itis_database_lookups(self, itis_db):
+        "ITIS: hierarchy, accepted names and terms from the local database"
+        full = itis.hierarchy_full(180541)
+        assert [w["taxonName"] for w in full] == [
+            "Animalia",
+            "Mammalia",
+            "Theria",
+            "Ursus",
+            "Ursus arctos",
+        ]
+        assert itis.hierarchy_up(180543)["parentName"] == "Ursus"
+        assert itis.accepted_names(180544)["acceptedName"] == "Ursus arctos"
+        assert itis.accepted_names(180543) == {}
+        assert itis.rank_name(180543)["rankName"] == "Species"
+        res = itis.terms("Ursus", what="scientific")
+        assert [w["scientificName"] for w in res] == [
+            "Ursus",
+            "Ursus arctos",
+            "Ursus horribilis",
+        ]
+        assert itis.terms("grizzly", what="common")[0]["tsn"] == "180543"
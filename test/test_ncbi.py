@@ -1,7 +1,42 @@
+import os
+import time
+
+import pytest
 import vcr
 
 from pytaxize import ncbi
 
+_nodes = [
+    (1, 1, "no rank"),
+    (131567, 1, "cellular root"),
+    (2759, 131567, "domain"),
+    (9605, 2759, "genus"),
+    (9606, 9605, "species"),
+    (63221, 9606, "subspecies"),
+]
+
+_names = [
+    (1, "root", "scientific name"),
+    (131567, "cellular organisms", "scientific name"),
+    (2759, "Eukaryota", "scientific name"),
+    (9605, "Homo", "scientific name"),
+    (9606, "Homo sapiens", "scientific name"),
+    (9606, "human", "genbank common name"),
+    (63221, "Homo sapiens neanderthalensis", "scientific name"),
+    (63221, "Neandertal", "common name"),
+]
+
+
+@pytest.fixture
+def taxdump(tmp_path):
+    with open(tmp_path / "nodes.dmp", "w") as f:
+        for taxid, parent, rank in _nodes:
+            f.write(f"{taxid}\t|\t{parent}\t|\t{rank}\t|\t\t|\t0\t|\n")
+    with open(tmp_path / "names.dmp", "w") as f:
+        for taxid, name, kind in _names:
+            f.write(f"{taxid}\t|\t{name}\t|\t\t|\t{kind}\t|\n")
+    return tmp_path
+
 
 class TestNcbi:
     @vcr.use_cassette("test/vcr_cassettes/ncbi_search.yml",
@@ -15,3 +50,185 @@ class TestNcbi:
         assert isinstance(x['Apis'][0], dict)
         assert x['Apis'][0]['ScientificName'] == "Apis"
         assert x['Apis'][0]['TaxId'] == "7459"
+
+    @vcr.use_cassette("test/vcr_cassettes/sci2comm_str_ncbi.yml",
+      filter_query_parameters=['api_key'])
+    def test_ncbi_hierarchy(self):
+        "ncbi.hierarchy"
+        x = ncbi.hierarchy(ids=4232)
+        assert list(x.keys()) == [4232]
+        assert x[4232][0] == {
+            "ScientificName": "cellular organisms",
+            "Rank": "cellular root",
+            "TaxId": "131567",
+        }
+        assert x[4232][-1]["ScientificName"] == "Helianthus annuus"
+        assert x[4232][-2]["Rank"] == "genus"
+        assert len(x[4232]) == 23
+
+    @vcr.use_cassette("test/vcr_cassettes/sci2comm_str_ncbi.yml",
+      filter_query_parameters=['api_key'], allow_playback_repeats=True)
+    def test_ncbi_hierarchy_compact(self):
+        "ncbi.hierarchy compact"
+        x = ncbi.hierarchy(ids=4232, compact=True)
+        y = ncbi.hierarchy(ids=4232, compact=True)
+        assert x[4232][0] is y[4232][0]
+        assert x[4232][-1]["ScientificName"] == "Helianthus annuus"
+        assert len(x[4232]) == 23
+
+    def test_ncbi_search_bulk(self, monkeypatch):
+        "ncbi.search bulk mode"
+        from lxml import etree
+
+        taxa = {"7459": "Apis", "9696": "Puma concolor", "7460": "Apis mellifera"}
+        calls = []
+
+        def entrez(path="esearch", args={}):
+            calls.append(args.get("term") or args.get("ID"))
+            if path == "esearch":
+                ids = ["7459", "9696"] if " OR " in args["term"] else ["7460"]
+                xml = "".join(f"<Id>{w}</Id>" for w in ids)
+                return etree.fromstring(f"<r><IdList>{xml}</IdList></r>")
+            ids = args["ID"] if isinstance(args["ID"], list) else args["ID"].split(",")
+            docs = "".join(
+                f'<DocSum><Id>{w}</Id><Item Name="ScientificName">{taxa[str(w)]}'
+                f'</Item><Item Name="TaxId">{w}</Item></DocSum>'
+                for w in ids
+            )
+            return etree.fromstring(f"<r>{docs}</r>")
+
+        monkeypatch.setenv("ENTREZ_KEY", "key")
+        monkeypatch.setattr(ncbi.ncbi, "_entrez", entrez)
+        names = ["Apis", "Puma  concolor", "honey bee"]
+        x = ncbi.search(sci_com=names, bulk=True)
+        assert list(x.keys()) == names
+        assert x["Apis"][0]["TaxId"] == "7459"
+        assert x["Puma  concolor"][0]["ScientificName"] == "Puma concolor"
+        # common names are not matched on ScientificName, so searched alone
+        assert x["honey bee"][0]["ScientificName"] == "Apis mellifera"
+        assert len(calls) == 4
+
+    def test_ncbi_hierarchy_history_pages(self, monkeypatch):
+        "ncbi.hierarchy posts long id lists and fetches them in pages"
+        from lxml import etree
+
+        requests = []
+
+        class Fake:
+            def __init__(self, url, payload={}, request="get"):
+                self.url = url
+                self.payload = payload
+                self.request = request
+
+            def xml(self, **kwargs):
+                requests.append((self.request, self.url, kwargs["data"]))
+                xml = "<ePostResult><QueryKey>1</QueryKey><WebEnv>W</WebEnv>"
+                return etree.fromstring(xml + "</ePostResult>")
+
+            def iterxml(self, tag=None, **kwargs):
+                requests.append((self.request, self.url, self.payload))
+                start = self.payload["retstart"]
+                ids = posted[start : start + self.payload["retmax"]]
+                xml = "".join(
+                    f"<Taxon><TaxId>{w}</TaxId><ScientificName>t{w}</ScientificName>"
+                    "<Rank>species</Rank></Taxon>"
+                    for w in ids
+                )
+                root = etree.fromstring(f"<TaxaSet>{xml}</TaxaSet>")
+                yield from list(root)
+
+        posted = [str(w) for w in range(1, 1001)]
+        monkeypatch.setattr(ncbi.ncbi, "Refactor", Fake)
+        taxa = ncbi.ncbi._efetch_taxa(posted, "key", page_size=300)
+        assert [w.findtext("TaxId") for w in taxa] == posted
+        assert requests[0][0] == "post"
+        assert requests[0][2]["id"].startswith("1,2,3")
+        pages = [w[2]["retstart"] for w in requests[1:]]
+        assert pages == [0, 300, 600, 900]
+        assert all(w[2]["WebEnv"] == "W" for w in requests[1:])
+
+    def test_ncbi_hierarchy_matches_taxids(self, monkeypatch):
+        "ncbi.hierarchy matches lineages to ids on their TaxId"
+        from lxml import etree
+
+        posted = []
+
+        class Fake:
+            def __init__(self, url, payload={}, request="get"):
+                self.payload = payload
+
+            def xml(self, **kwargs):
+                posted.extend((kwargs.get("data") or self.payload)["id"].split(","))
+                xml = "<ePostResult><QueryKey>1</QueryKey><WebEnv>W</WebEnv>"
+                return etree.fromstring(xml + "</ePostResult>")
+
+            def iterxml(self, tag=None, **kwargs):
+                if "ID" in self.payload:
+                    ids = self.payload["ID"].split(",")
+                else:
+                    start = self.payload["retstart"]
+                    ids = posted[start : start + self.payload["retmax"]]
+                xml = ""
+                for w in ids:
+                    if w == "0":
+                        # unknown ids are left out
+                        continue
+                    taxid, aka = w, ""
+                    if w == "99":
+                        # 99 was merged into 100
+                        taxid = "100"
+                        aka = "<AkaTaxIds><TaxId>99</TaxId></AkaTaxIds>"
+                    xml += (
+                        f"<Taxon><TaxId>{taxid}</TaxId><ScientificName>t{taxid}"
+                        f"</ScientificName><Rank>species</Rank>{aka}</Taxon>"
+                    )
+                root = etree.fromstring(f"<TaxaSet>{xml}</TaxaSet>")
+                yield from list(root)
+
+        monkeypatch.setattr(ncbi.ncbi, "Refactor", Fake)
+        ids = [5, 0, 99, 7, 5, "7"]
+        res = list(ncbi.iter_hierarchy(ids))
+        assert [w[0] for w in res] == [5, 0, 99, 7]
+        lineages = [[x["TaxId"] for x in w[1]] for w in res]
+        assert lineages == [["5"], [], ["100"], ["7"]]
+
+        ids = list(range(300)) * 2
+        res = dict(ncbi.iter_hierarchy(ids))
+        assert len(posted) == 300
+        assert res[0] == [] and res[99][0]["TaxId"] == "100"
+        assert all(res[w][0]["TaxId"] == str(w) for w in range(1, 300) if w != 99)
+
+    def test_ncbi_taxdump(self, taxdump):
+        "ncbi.Taxdump answers lineages and exact name searches"
+        dump = ncbi.Taxdump(str(taxdump))
+        assert len(dump) == 6
+        assert dump.search("HUMAN") == [9606]
+        assert dump.search("Homo", rank="species") == []
+        assert dump.search("Pan") == []
+        assert dump.lineage(12345) == []
+        ncbi.set_backend(dump)
+        try:
+            x = ncbi.hierarchy(ids=[9606])
+            assert [w["TaxId"] for w in x[9606]] == ["131567", "2759", "9605", "9606"]
+            assert x[9606][-1] == {
+                "ScientificName": "Homo sapiens",
+                "Rank": "species",
+                "TaxId": "9606",
+            }
+            res = ncbi.search(sci_com=["Neandertal", "Pan"])
+            assert res["Neandertal"][0]["TaxId"] == "63221"
+            assert res["Pan"] == []
+        finally:
+            ncbi.set_backend(None)
+            dump.close()
+
+    def test_ncbi_taxdump_index_is_reused(self, taxdump):
+        "ncbi.Taxdump builds its index once"
+        ncbi.Taxdump(str(taxdump)).close()
+        index = os.path.join(taxdump, "pytaxize_taxdump.idx")
+        built = os.path.getmtime(index)
+        time.sleep(0.01)
+        dump = ncbi.Taxdump(str(taxdump))
+        assert os.path.getmtime(index) == built
+        assert dump.name(9605) == "Homo"
+        dump.close()
@@ -0,0 +1,277 @@
+"""Tests for the HTTP transport layer of pytaxize"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from pytaxize import refactor
+from pytaxize.cache import ResponseCache
+from pytaxize.refactor import Refactor
+from pytaxize.utils import run_concurrent
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    seen = []
+    # scripted statuses returned before answering with 200
+    script = []
+    retry_after = "0"
+
+    def do_GET(self):
+        self.seen.append(self.path)
+        if self.script:
+            status = self.script.pop(0)
+            self.send_response(status)
+            self.send_header("Retry-After", self.retry_after)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path.startswith("/xml"):
+            body = b"<TaxaSet><Taxon><TaxId>1</TaxId></Taxon></TaxaSet>"
+            kind = "text/xml"
+        else:
+            body = json.dumps({"path": self.path}).encode()
+            kind = "application/json"
+        self.send_response(200)
+        self.send_header("Content-Type", kind)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    StubHandler.seen.clear()
+    StubHandler.script.clear()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+    refactor.configure_pool()
+
+
+class TestSessionPool:
+    def test_connections_are_reused(self, stub):
+        "Refactor: keep-alive connections are reused"
+        refactor.configure_pool(maxsize=2)
+        for i in range(5):
+            assert Refactor(stub + "/x", {"i": i}).json() == {"path": f"/x?i={i}"}
+        stats = refactor.pool_stats()["127.0.0.1"]
+        assert stats["requests"] == 5
+        assert stats["connections"] == 1
+        assert stats["reused"] == 4
+
+    def test_pool_is_shared_across_threads(self, stub):
+        "Refactor: threads share the same connection pool"
+        refactor.configure_pool(maxsize=1, hosts={"127.0.0.1": 4})
+
+        def work():
+            for _ in range(5):
+                Refactor(stub + "/y").json()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        stats = refactor.pool_stats()["127.0.0.1"]
+        assert stats["requests"] == 20
+        assert stats["reused"] >= 20 - 4
+
+
+class TestResponseCache:
+    def test_cache_hits_skip_network(self, stub, tmp_path):
+        "Refactor: cached responses are served without a request"
+        refactor.enable_cache(path=str(tmp_path / "cache.sqlite"))
+        try:
+            first = Refactor(stub + "/c", {"a": 1, "b": 2, "api_key": "x"}).json()
+            second = Refactor(stub + "/c", {"b": 2, "a": 1, "api_key": "y"}).json()
+            assert first == second
+            assert len(StubHandler.seen) == 1
+            assert refactor.cache_stats()["hits"] == 1
+        finally:
+            refactor.disable_cache()
+
+    def test_cache_hits_stream(self, stub, tmp_path):
+        "Refactor: cached responses can be parsed incrementally"
+        refactor.enable_cache(path=str(tmp_path / "cache.sqlite"))
+        try:
+            for _ in range(2):
+                taxa = Refactor(stub + "/xml").iterxml(tag="Taxon")
+                assert [w.findtext("TaxId") for w in taxa] == ["1"]
+            assert len(StubHandler.seen) == 1
+        finally:
+            refactor.disable_cache()
+
+    def test_cache_ttl_per_host(self, stub, tmp_path):
+        "Refactor: expired responses are fetched again"
+        path = str(tmp_path / "cache.sqlite")
+        refactor.enable_cache(path=path, ttls={"127.0.0.1": 0})
+        try:
+            Refactor(stub + "/t").raw()
+            Refactor(stub + "/t").raw()
+            assert len(StubHandler.seen) == 2
+        finally:
+            refactor.disable_cache()
+
+    def test_cache_ttl_per_provider(self, tmp_path):
+        "Refactor: TTLs can be keyed by provider like rate limits"
+        cache = refactor.enable_cache(
+            path=str(tmp_path / "cache.sqlite"), ttls={"gn": 60, "a.org": 5}
+        )
+        try:
+            assert cache.ttls == {
+                "resolver.globalnames.org": 60,
+                "gni.globalnames.org": 60,
+                "finder.globalnames.org": 60,
+                "a.org": 5,
+            }
+        finally:
+            refactor.disable_cache()
+
+    def test_cache_lru_eviction(self, stub, tmp_path):
+        "Refactor: least recently used responses are evicted past max_size"
+        cache = refactor.enable_cache(path=str(tmp_path / "cache.sqlite"), max_size=20)
+        try:
+            Refactor(stub + "/one").raw()
+            Refactor(stub + "/two").raw()
+            assert cache.stats()["entries"] == 1
+            Refactor(stub + "/two").raw()
+            assert StubHandler.seen == ["/one", "/two"]
+        finally:
+            refactor.disable_cache()
+
+    def test_cache_hits_count_for_eviction(self, tmp_path):
+        "ResponseCache: batched access times still decide what is evicted"
+        path = str(tmp_path / "cache.sqlite")
+        cache = ResponseCache(path, max_size=30)
+        cache.set("a", "h", b"a" * 10)
+        cache.set("b", "h", b"b" * 10)
+        assert cache.get("a", "h") is not None
+        cache.set("c", "h", b"c" * 15)
+        assert cache.get("b", "h") is None
+        assert cache.get("a", "h") is not None
+        assert cache.stats()["size"] == 25
+        cache.close()
+        assert ResponseCache(path).stats() == {
+            "hits": 0,
+            "misses": 0,
+            "entries": 2,
+            "size": 25,
+        }
+
+
+class TestRateLimiter:
+    def test_rate_limit_spaces_requests(self, stub):
+        "Refactor: requests to a limited host are spaced by the token bucket"
+        refactor.set_rate_limit("127.0.0.1", 20, burst=1)
+        try:
+            start = time.monotonic()
+            for _ in range(5):
+                Refactor(stub + "/r").raw()
+            assert time.monotonic() - start >= 0.19
+        finally:
+            refactor.set_rate_limit("127.0.0.1", None)
+
+    def test_rate_limit_must_be_positive(self):
+        "Refactor: a rate of 0 or less is rejected"
+        for rate in (0, -1):
+            with pytest.raises(ValueError):
+                refactor.set_rate_limit("itis", rate)
+        assert "www.itis.gov" not in refactor._limiter.limits
+
+    def test_ncbi_default_depends_on_entrez_key(self, monkeypatch):
+        "Refactor: NCBI default rate is 10/s with ENTREZ_KEY, 3/s without"
+        limiter = refactor.RateLimiter()
+        monkeypatch.delenv("ENTREZ_KEY", raising=False)
+        assert limiter.limit("eutils.ncbi.nlm.nih.gov") == (3, 3)
+        monkeypatch.setenv("ENTREZ_KEY", "key")
+        assert limiter.limit("eutils.ncbi.nlm.nih.gov") == (10, 10)
+        assert limiter.limit("www.itis.gov") is None
+
+
+class TestRetries:
+    def test_retry_transient_errors(self, stub):
+        "Refactor: 429/5xx responses are retried"
+        refactor.retry_stats(reset=True)
+        StubHandler.script.extend([503, 429])
+        assert Refactor(stub + "/f").json() == {"path": "/f"}
+        assert len(StubHandler.seen) == 3
+        stats = refactor.retry_stats()
+        assert stats["retries"] == 2
+        assert stats["gave_up"] == 0
+
+    def test_retry_gives_up(self, stub):
+        "Refactor: calls fail once their retries are used"
+        refactor.configure_retries(retries=1, backoff=0.01)
+        refactor.retry_stats(reset=True)
+        StubHandler.script.extend([500, 500, 500])
+        try:
+            with pytest.raises(requests.HTTPError):
+                Refactor(stub + "/f").json()
+            assert len(StubHandler.seen) == 2
+            assert refactor.retry_stats()["gave_up"] == 1
+        finally:
+            refactor.configure_retries()
+
+    def test_retry_budget(self, stub):
+        "Refactor: a retry budget caps retries across calls"
+        refactor.retry_stats(reset=True)
+        StubHandler.script.extend([502, 502, 502])
+        with refactor.retry_budget(1):
+            with pytest.raises(requests.HTTPError):
+                Refactor(stub + "/f").json()
+        assert len(StubHandler.seen) == 2
+        assert refactor.retry_stats()["budget_exhausted"] == 1
+
+    def test_retry_after_too_long_gives_up(self, stub):
+        "Refactor: calls are not retried when Retry-After exceeds max_backoff"
+        refactor.configure_retries(max_backoff=0)
+        StubHandler.script.extend([429])
+        StubHandler.retry_after = "120"
+        try:
+            with pytest.raises(requests.HTTPError):
+                Refactor(stub + "/f").json()
+            assert len(StubHandler.seen) == 1
+        finally:
+            refactor.configure_retries()
+            StubHandler.retry_after = "0"
+
+    def test_retry_budget_per_thread(self, stub):
+        "Refactor: retry budgets of concurrent blocks are independent"
+        refactor.retry_stats(reset=True)
+        budgets = {}
+        ready = threading.Barrier(2)
+
+        def work(name, size):
+            with refactor.retry_budget(size) as budget:
+                ready.wait()
+                budgets[name] = refactor._retry_budget.get() is budget
+                # threads started by pytaxize draw on the same budget
+                res = run_concurrent(lambda _: refactor._retry_budget.get(), [1, 2])
+                budgets[name] &= all(w is budget for w, _ in res)
+
+        threads = [
+            threading.Thread(target=work, args=(w, i)) for i, w in enumerate("ab")
+        ]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        assert budgets == {"a": True, "b": True}
+        assert refactor._retry_budget.get() is None
+
+    def test_retry_after_is_honored(self):
+        "Refactor: Retry-After overrides the exponential backoff"
+        policy = refactor.RetryPolicy(backoff=100, max_backoff=5)
+        response = requests.Response()
+        response.headers["Retry-After"] = "2"
+        assert policy.delay(3, response) == 2
+        # longer than max_backoff: give up rather than retry too early
+        response.headers["Retry-After"] = "120"
+        assert policy.delay(3, response) is None
+        assert 0 <= policy.delay(0) <= 5
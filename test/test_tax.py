@@ -0,0 +1,79 @@
+"""Tests for tax module of pytaxize"""
+
+import re
+
+import pytest
+
+from pytaxize import tax
+
+
+class Fake:
+    uploads = []
+
+    def __init__(self, url, payload={}, request="get", cache=True):
+        pass
+
+    def json(self, json=None, files=None, data=None):
+        if files is not None:
+            name, f = files["file"]
+            Fake.uploads.append((name, f.read(), data))
+            return {"metadata": {"totalNames": 0}, "names": []}
+        names = [
+            {"verbatim": m.group(), "start": m.start(), "end": m.end()}
+            for m in re.finditer(r"Pardosa moesta|Poa annua", json["text"])
+        ]
+        return {"metadata": {"totalNames": len(names)}, "names": names}
+
+
+class TestScrapenames:
+    def test_split_text(self):
+        "tax._split_text cuts at blank lines and keeps offsets"
+        text = ("Poa annua grows here.\n\n" * 50) + "x" * 300
+        pieces = tax._split_text(text, 200)
+        assert "".join(w for _, w in pieces) == text
+        assert all(len(w) <= 200 for _, w in pieces)
+        assert all(text[o : o + len(w)] == w for o, w in pieces)
+        assert all(w.endswith("\n\n") for _, w in pieces[:-3])
+
+    def test_scrapenames_batch_checks_arguments(self, monkeypatch):
+        "tax.scrapenames_batch rejects empty chunks and takes a single text"
+        for size in (0, -1):
+            with pytest.raises(ValueError):
+                tax.scrapenames_batch(texts=["Poa annua"], chunk_size=size)
+        monkeypatch.setattr(tax, "Refactor", Fake)
+        res = list(tax.scrapenames_batch(texts="Poa annua L."))
+        assert len(res) == 1
+        assert res[0]["data"] == [{"verbatim": "Poa annua", "start": 0, "end": 9}]
+
+    def test_scrapenames_batch(self, monkeypatch):
+        "tax.scrapenames_batch merges pieces per document with document offsets"
+        monkeypatch.setattr(tax, "Refactor", Fake)
+        long = " ".join(["A spider named Pardosa moesta Banks, 1892."] * 500)
+        texts = [long, "Poa annua L.", "no names"]
+        res = list(tax.scrapenames_batch(texts=texts, chunk_size=1000))
+        assert len(res) == 3
+        names = res[0]["data"]
+        assert len(names) == 500
+        assert all(long[w["start"] : w["end"]] == w["verbatim"] for w in names)
+        assert res[0]["meta"]["metadata"]["totalNames"] == 500
+        assert res[1]["data"] == [{"verbatim": "Poa annua", "start": 0, "end": 9}]
+        assert res[2]["data"] == []
+
+    def test_scrapenames_batch_window(self, monkeypatch):
+        "tax.scrapenames_batch only sends a window of documents ahead"
+        monkeypatch.setattr(tax, "Refactor", Fake)
+        read = []
+        texts = (read.append(i) or "Poa annua L." for i in range(1000))
+        res = tax.scrapenames_batch(texts=texts, workers=2, prefetch=3)
+        assert next(res)["data"][0]["verbatim"] == "Poa annua"
+        res.close()
+        assert read == [0, 1, 2]
+
+    def test_scrapenames_file(self, monkeypatch, tmp_path):
+        "tax.scrapenames uploads files as multipart/form-data"
+        monkeypatch.setattr(tax, "Refactor", Fake)
+        Fake.uploads.clear()
+        path = tmp_path / "paper.txt"
+        path.write_bytes(b"Poa annua")
+        tax.scrapenames(file=str(path), unique=True)
+        assert Fake.uploads == [("paper.txt", b"Poa annua", {"unique": "true"})]